@@ -3,173 +3,192 @@
 Flask版本的燃油追踪应用 - 用于云平台部署
 """
 
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, Response, g, make_response, render_template_string, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+import hashlib
+import io
 import json
 import os
-from datetime import datetime
-from typing import List, Dict
+import re
+import time
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from functools import wraps
+from typing import List, Dict, Optional
 
 
 from simple_fuel_tracker import FuelTrackerSimple
+from fuel_events import EventBroker
+from fuel_fleet import VEHICLE_ID_PATTERN, FleetTracker, validate_vehicle_id
+import fuel_io
+
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """列式存储模式下记录是只读视图（Mapping），序列化时转换为字典"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Mapping):
+            return dict(o)
+        return DefaultJSONProvider.default(o)
 
 
 app = Flask(__name__)
-tracker = FuelTrackerSimple()
+app.json = RecordJSONProvider(app)
+app.config.update(
+    # 存储后端: json（默认）或 sqlite
+    TRACKER_BACKEND=os.environ.get('FUEL_TRACKER_BACKEND', 'json'),
+    TRACKER_DATA_FILE=os.environ.get('FUEL_TRACKER_DATA_FILE', 'fuel_records_simple.json'),
+    TRACKER_DB_FILE=os.environ.get('FUEL_TRACKER_DB', 'fuel_records.db'),
+    # FUEL_TRACKER_JOURNAL=1 时写操作只追加日志，不再整体重写数据文件
+    TRACKER_JOURNAL=os.environ.get('FUEL_TRACKER_JOURNAL') == '1',
+    # FUEL_TRACKER_FSYNC=0 时写入后不再 fsync，更快但断电时可能丢失最近的写入
+    TRACKER_FSYNC=os.environ.get('FUEL_TRACKER_FSYNC', '1') != '0',
+    # 组提交等待窗口（秒），窗口内并发到达的写操作合并为一次磁盘写入
+    TRACKER_COMMIT_WINDOW=float(os.environ.get('FUEL_TRACKER_COMMIT_WINDOW', 0)),
+    # 设置后启用延迟写入：请求只修改内存，后台线程在该秒数内写入磁盘（仅适用于单个 worker 进程）
+    TRACKER_WRITE_BEHIND=float(os.environ['FUEL_TRACKER_WRITE_BEHIND']) if os.environ.get('FUEL_TRACKER_WRITE_BEHIND') else None,
+    # FUEL_TRACKER_COLUMNAR=1 时记录以列式数组保存，适合大量历史数据
+    TRACKER_COLUMNAR=os.environ.get('FUEL_TRACKER_COLUMNAR') == '1',
+    # 事件流连接的最长保持时间（秒），到期后浏览器自动重连
+    EVENTS_MAX_DURATION=float(os.environ.get('FUEL_TRACKER_EVENTS_MAX_DURATION', 300)),
+    # 每个 worker 进程同时保持的事件流连接数上限，必须小于 worker 的线程数（Procfile 中为 12），
+    # 超出时返回 503，页面改为增删后刷新
+    EVENTS_MAX_CONNECTIONS=int(os.environ.get('FUEL_TRACKER_EVENTS_MAX_CONNECTIONS', 4)),
+    # 多车辆: 每辆车一个分片（<车辆编号>.json 或 .db），保存在该目录下
+    TRACKER_VEHICLES_DIR=os.environ.get('FUEL_TRACKER_VEHICLES_DIR', 'vehicles'),
+    # 同时加载在内存中的车辆数上限，以及分片空闲多少秒后卸载
+    TRACKER_MAX_VEHICLES=int(os.environ.get('FUEL_TRACKER_MAX_VEHICLES', 64)),
+    TRACKER_VEHICLE_IDLE=float(os.environ.get('FUEL_TRACKER_VEHICLE_IDLE', 600)),
+)
 
 
-@app.route('/')
-def index():
-    stats = tracker.get_statistics()
-    records = tracker.get_records()
-    efficiencies = tracker.calculate_fuel_efficiency()
-    recent_records = sorted(records, key=lambda x: x["date"], reverse=True)[:5]
-    
-    # 构建统计卡片
-    stats_cards = f'''
-    <div class="stat-card">
-        <div class="stat-value">{stats['total_records']}</div>
-        <div class="stat-label">总记录数</div>
-    </div>
-    <div class="stat-card">
-        <div class="stat-value">¥{stats['total_cost']:.2f}</div>
-        <div class="stat-label">总花费</div>
-    </div>
-    <div class="stat-card">
-        <div class="stat-value">{stats['total_distance']:.2f}km</div>
-        <div class="stat-label">总里程</div>
-    </div>
-    <div class="stat-card">
-        <div class="stat-value">{stats['average_consumption']:.2f}L/100km</div>
-        <div class="stat-label">平均油耗</div>
-    </div>
-    '''
-    
-    # 构建最近记录表格
-    recent_table = ''
-    if not recent_records:
-        recent_table = '<p>暂无加油记录</p>'
-    else:
-        recent_table = '''
-        <table>
-            <thead>
-                <tr>
-                    <th>日期</th>
-                    <th>里程(km)</th>
-                    <th>加油量(L)</th>
-                    <th>费用(¥)</th>
-                    <th>加油站</th>
-                    <th>操作</th>
-                </tr>
-            </thead>
-            <tbody>
-        '''
-        for i, record in enumerate(recent_records):
-            station = record['station'] if record['station'] else '-'
-            # 计算全局索引
-            global_index = next((idx for idx, r in enumerate(records) if r['date'] == record['date'] and r['odometer'] == record['odometer']), -1)
-            recent_table += f'''
-                <tr>
-                    <td>{record['date']}</td>
-                    <td>{record['odometer']}</td>
-                    <td>{record['fuel_amount']}</td>
-                    <td>{record['cost']}</td>
-                    <td>{station}</td>
-                    <td><button onclick="deleteRecord({global_index})" class="delete-btn">删除</button></td>
-                </tr>
-            '''
-        recent_table += '''
-            </tbody>
-        </table>
-        '''
-    
-    # 构建完整记录表格
-    full_table = ''
-    if not records:
-        full_table = '<p>暂无加油记录</p>'
-    else:
-        full_table = '''
-        <table>
-            <thead>
-                <tr>
-                    <th>日期</th>
-                    <th>里程(km)</th>
-                    <th>加油量(L)</th>
-                    <th>油价(¥/L)</th>
-                    <th>费用(¥)</th>
-                    <th>加油站</th>
-                    <th>备注</th>
-                    <th>操作</th>
-                </tr>
-            </thead>
-            <tbody>
-        '''
-        for i, record in enumerate(records):
-            station = record['station'] if record['station'] else '-'
-            note = record['note'] if record['note'] else '-'
-            full_table += f'''
-                <tr id="record-row-{i}">
-                    <td>{record['date']}</td>
-                    <td>{record['odometer']}</td>
-                    <td>{record['fuel_amount']}</td>
-                    <td>{record['fuel_price']}</td>
-                    <td>{record['cost']}</td>
-                    <td>{station}</td>
-                    <td>{note}</td>
-                    <td><button onclick="deleteRecord({i})" class="delete-btn">删除</button></td>
-                </tr>
-            '''
-        full_table += '''
-            </tbody>
-        </table>
-        '''
-    
-    # 构建效率表格
-    efficiency_table = ''
-    if not efficiencies:
-        efficiency_table = '<p>暂无油耗数据（需要至少2条记录才能计算油耗）</p>'
-    else:
-        efficiency_table = '''
-        <table>
-            <thead>
-                <tr>
-                    <th>日期</th>
-                    <th>行驶距离(km)</th>
-                    <th>耗油量(L)</th>
-                    <th>油耗(L/100km)</th>
-                    <th>效率(km/L)</th>
-                </tr>
-            </thead>
-            <tbody>
-        '''
-        for eff in efficiencies:
-            efficiency_table += f'''
-                <tr>
-                    <td>{eff['date']}</td>
-                    <td>{eff['distance']}</td>
-                    <td>{eff['fuel_used']}</td>
-                    <td>{eff['consumption_l_per_100km']}</td>
-                    <td>{eff['efficiency_km_per_l']}</td>
-                </tr>
-            '''
-        efficiency_table += '''
-            </tbody>
-        </table>
-        '''
-    
-    # 构建统计信息列表
-    stats_list = f'''
-        <li><strong>总记录数:</strong> {stats['total_records']}</li>
-        <li><strong>总花费:</strong> ¥{stats['total_cost']:.2f}</li>
-        <li><strong>总加油量:</strong> {stats['total_fuel']:.2f}L</li>
-        <li><strong>平均油价:</strong> ¥{stats['average_price']:.2f}/L</li>
-        <li><strong>总行驶里程:</strong> {stats['total_distance']:.2f}km</li>
-        <li><strong>平均油耗:</strong> {stats['average_consumption']:.2f}L/100km</li>
-    '''
-    if stats['first_date'] and stats['last_date']:
-        stats_list += f'<li><strong>记录期间:</strong> {stats["first_date"]} 至 {stats["last_date"]}</li>'
-    
-    # HTML模板
-    html_template = '''<!DOCTYPE html>
+def create_tracker(config, shard_base: Optional[str] = None):
+    """根据配置创建存储后端；shard_base 为车辆分片的路径（不含扩展名），不传时为默认的单车数据"""
+    if config['TRACKER_BACKEND'] == 'sqlite':
+        from sqlite_fuel_tracker import FuelTrackerSQLite
+        if shard_base is not None:
+            return FuelTrackerSQLite(shard_base + '.db')
+        sqlite_tracker = FuelTrackerSQLite(config['TRACKER_DB_FILE'])
+        # 首次启用时迁移已有的 JSON 数据
+        sqlite_tracker.import_json(config['TRACKER_DATA_FILE'])
+        return sqlite_tracker
+    return FuelTrackerSimple(
+        config['TRACKER_DATA_FILE'] if shard_base is None else shard_base + '.json',
+        journal=config['TRACKER_JOURNAL'],
+        fsync=config['TRACKER_FSYNC'],
+        commit_window=config['TRACKER_COMMIT_WINDOW'],
+        write_behind=config['TRACKER_WRITE_BEHIND'],
+        columnar=config['TRACKER_COLUMNAR']
+    )
+
+
+tracker = create_tracker(app.config)
+event_broker = EventBroker(max_subscribers=app.config['EVENTS_MAX_CONNECTIONS'])
+
+
+def vehicle_shard_files(vehicle_id: str) -> List[str]:
+    """车辆分片在磁盘上的数据文件，任意一个存在即表示该车辆已有数据"""
+    base = os.path.join(app.config['TRACKER_VEHICLES_DIR'], vehicle_id)
+    if app.config['TRACKER_BACKEND'] == 'sqlite':
+        return [base + '.db']
+    # 日志模式下还没合并过的车辆只有日志文件
+    return [base + '.json', base + '.journal.jsonl']
+
+
+def open_vehicle_tracker(vehicle_id: str):
+    """加载一辆车的分片，存储方式与默认数据相同"""
+    os.makedirs(app.config['TRACKER_VEHICLES_DIR'], exist_ok=True)
+    return create_tracker(app.config, os.path.join(app.config['TRACKER_VEHICLES_DIR'], vehicle_id))
+
+
+fleet = FleetTracker(
+    open_vehicle_tracker,
+    lambda vehicle_id: any(os.path.exists(path) for path in vehicle_shard_files(vehicle_id)),
+    max_loaded=app.config['TRACKER_MAX_VEHICLES'],
+    idle_timeout=app.config['TRACKER_VEHICLE_IDLE']
+)
+
+
+def current_tracker():
+    """当前请求使用的存储：/api/vehicles/<车辆编号>/... 为该车辆的分片，其余为默认数据"""
+    return g.get('tracker', tracker)
+
+
+def api_route(rule: str, creates_vehicle: bool = False, **options):
+    """注册 /api/... 接口，同时在 /api/vehicles/<vehicle_id>/... 下注册作用于该车辆分片的同名接口
+
+    只有 creates_vehicle=True 的接口（添加、导入记录）会为还没有数据的车辆创建分片，其余接口返回 404
+    """
+    def decorator(view):
+        app.add_url_rule(rule, view_func=view, **options)
+
+        @wraps(view)
+        def vehicle_view(vehicle_id, **kwargs):
+            try:
+                validate_vehicle_id(vehicle_id)
+            except ValueError as e:
+                return jsonify({"success": False, "message": str(e)}), 400
+            # 查询、删除等请求不为还没有数据的车辆创建分片，也不在磁盘上留下任何文件
+            if not creates_vehicle and not fleet.has_vehicle(vehicle_id):
+                return jsonify({"success": False, "message": "车辆不存在"}), 404
+            with fleet.lease(vehicle_id) as vehicle_tracker:
+                g.vehicle_id = vehicle_id
+                g.tracker = vehicle_tracker
+                return view(**kwargs)
+
+        app.add_url_rule('/api/vehicles/<vehicle_id>' + rule[len('/api'):], endpoint='vehicle_' + view.__name__,
+                         view_func=vehicle_view, **options)
+        return view
+    return decorator
+
+
+def publish_change(event: str, data: Dict):
+    """推送记录变化，并附带最新统计信息"""
+    if 'vehicle_id' in g:
+        # 事件流只服务默认数据的页面，车辆分片的变化不推送
+        return
+    event_broker.publish(event, data)
+    event_broker.publish('stats-changed', tracker.get_statistics())
+
+
+def conditional_get(daily: bool = False):
+    """按数据版本号生成强 ETag 和 Last-Modified，缓存仍然有效时直接返回 304，不执行视图
+
+    daily=True 时 ETag 还包含当天日期，用于页面中带有当天日期的视图
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # 先取版本号再生成内容，期间若有写入，下次请求会因版本号变化重新生成
+            version = current_tracker().data_version
+            modified = current_tracker().last_modified
+            variant = request.full_path
+            if daily:
+                variant += datetime.now().strftime('%Y-%m-%d')
+            etag = hashlib.sha1(f"{version}:{modified!r}:{variant}".encode('utf-8')).hexdigest()[:20]
+            last_modified = datetime.fromtimestamp(int(modified), tz=timezone.utc)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
+
+            response = app.response_class(status=304) if not_modified else make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag)
+                # Last-Modified 只精确到秒，同一秒内可能还有写入，这种情况只依赖 ETag
+                if int(modified) < int(time.time()):
+                    response.last_modified = last_modified
+                # 允许缓存，但每次使用前都要向服务器验证
+                response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+# 页面模板，<!--name--> 处在渲染时替换为对应的片段；模板只在模块加载时解析一次
+PAGE_TEMPLATE = '''<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
@@ -294,6 +313,10 @@ def index():
             background-color: #007bff;
             color: white;
         }
+        .load-more {
+            display: none;
+            margin-top: 15px;
+        }
     </style>
 </head>
 <body>
@@ -311,12 +334,12 @@ def index():
         <div id="dashboard" class="tab-content active">
             <h2>📊 仪表盘</h2>
             <div class="stats-grid">
-                ''' + stats_cards + '''
+                <!--stats_cards-->
             </div>
             
             <div class="card">
                 <h3>📈 最近加油记录</h3>
-                ''' + recent_table + '''
+                <div id="recent-content"><!--recent_table--></div>
             </div>
         </div>
         
@@ -325,7 +348,7 @@ def index():
             <form id="addForm" method="post" action="/api/add_record">
                 <div class="form-group">
                     <label for="date">日期:</label>
-                    <input type="date" id="date" name="date" value="''' + datetime.now().strftime('%Y-%m-%d') + '''" required>
+                    <input type="date" id="date" name="date" value="<!--today-->" required>
                 </div>
                 <div class="form-group">
                     <label for="odometer">里程数 (km):</label>
@@ -351,22 +374,25 @@ def index():
             </form>
         </div>
         
+        <!-- 以下标签页首次打开时才通过 JSON 接口分页加载 -->
         <div id="records" class="tab-content">
             <h2>📋 加油记录</h2>
-            ''' + full_table + '''
+            <div id="records-content"><p>加载中...</p></div>
+            <button id="records-more" class="load-more" onclick="loadRecords()">加载更多</button>
         </div>
         
         <div id="efficiency" class="tab-content">
             <h2>📊 油耗详情</h2>
-            ''' + efficiency_table + '''
+            <div id="efficiency-content"><p>加载中...</p></div>
+            <button id="efficiency-more" class="load-more" onclick="loadEfficiency()">加载更多</button>
         </div>
         
         <div id="stats" class="tab-content">
             <h2>📈 统计信息</h2>
             <div class="card">
                 <h3>总览</h3>
-                <ul>
-                    ''' + stats_list + '''
+                <ul id="stats-list">
+                    <li>加载中...</li>
                 </ul>
             </div>
         </div>
@@ -388,6 +414,152 @@ def index():
             
             // 设置选中的 tab 为激活状态
             event.target.classList.add('active');
+            
+            // 首次打开时加载数据
+            if (tabLoaders[tabName] && !loadedTabs[tabName]) {
+                loadedTabs[tabName] = true;
+                tabLoaders[tabName]();
+            }
+        }
+        
+        const PAGE_SIZE = 50;
+        const loadedTabs = {};
+        const tabLoaders = {
+            records: () => loadRecords(),
+            efficiency: () => loadEfficiency(),
+            stats: () => loadStats()
+        };
+        let recordsCursor = null;
+        let efficiencyOffset = 0;
+        
+        // 在容器中创建表格（已存在则复用），返回 tbody
+        function ensureTable(containerId, headers) {
+            const container = document.getElementById(containerId);
+            let tbody = container.querySelector('tbody');
+            if (!tbody) {
+                const table = document.createElement('table');
+                const headRow = table.createTHead().insertRow();
+                headers.forEach(text => {
+                    const th = document.createElement('th');
+                    th.textContent = text;
+                    headRow.appendChild(th);
+                });
+                tbody = table.createTBody();
+                container.replaceChildren(table);
+            }
+            return tbody;
+        }
+        
+        function appendRow(tbody, values, index = -1) {
+            const row = tbody.insertRow(index);
+            values.forEach(value => {
+                const cell = row.insertCell();
+                if (value instanceof Node) {
+                    cell.appendChild(value);
+                } else {
+                    cell.textContent = value;
+                }
+            });
+            return row;
+        }
+        
+        function deleteButton(recordId) {
+            const button = document.createElement('button');
+            button.className = 'delete-btn';
+            button.textContent = '删除';
+            button.onclick = () => deleteRecord(recordId);
+            return button;
+        }
+        
+        function showLoadError(containerId) {
+            document.getElementById(containerId).innerHTML = '<p>加载失败，请检查网络连接</p>';
+        }
+        
+        // 加油记录：按 ID 游标分页
+        function loadRecords() {
+            let url = '/api/records?limit=' + PAGE_SIZE;
+            if (recordsCursor) {
+                url += '&after=' + recordsCursor;
+            }
+            fetch(url)
+            .then(response => {
+                recordsCursor = response.headers.get('X-Next-Cursor');
+                return response.json();
+            })
+            .then(records => {
+                if (records.length === 0 && !document.querySelector('#records-content tbody')) {
+                    document.getElementById('records-content').innerHTML = '<p>暂无加油记录</p>';
+                } else {
+                    const tbody = ensureTable('records-content', ['日期', '里程(km)', '加油量(L)', '油价(¥/L)', '费用(¥)', '加油站', '备注', '操作']);
+                    records.forEach(record => {
+                        const row = appendRow(tbody, [record.date, record.odometer, record.fuel_amount, record.fuel_price,
+                            record.cost, record.station || '-', record.note || '-', deleteButton(record.id)]);
+                        row.id = 'record-row-' + record.id;
+                    });
+                }
+                document.getElementById('records-more').style.display = recordsCursor ? 'inline-block' : 'none';
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                showLoadError('records-content');
+            });
+        }
+        
+        // 油耗详情：按偏移量分页
+        function loadEfficiency() {
+            fetch('/api/efficiency?limit=' + PAGE_SIZE + '&offset=' + efficiencyOffset)
+            .then(response => {
+                const nextOffset = response.headers.get('X-Next-Offset');
+                efficiencyOffset = nextOffset ? parseInt(nextOffset, 10) : null;
+                return response.json();
+            })
+            .then(efficiencies => {
+                if (efficiencies.length === 0 && !document.querySelector('#efficiency-content tbody')) {
+                    document.getElementById('efficiency-content').innerHTML = '<p>暂无油耗数据（需要至少2条记录才能计算油耗）</p>';
+                } else {
+                    const tbody = ensureTable('efficiency-content', ['日期', '行驶距离(km)', '耗油量(L)', '油耗(L/100km)', '效率(km/L)']);
+                    efficiencies.forEach(eff => {
+                        appendRow(tbody, [eff.date, eff.distance, eff.fuel_used, eff.consumption_l_per_100km, eff.efficiency_km_per_l]);
+                    });
+                }
+                document.getElementById('efficiency-more').style.display = efficiencyOffset !== null ? 'inline-block' : 'none';
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                showLoadError('efficiency-content');
+            });
+        }
+        
+        function renderStats(stats) {
+            const items = [
+                ['总记录数', stats.total_records],
+                ['总花费', '¥' + stats.total_cost.toFixed(2)],
+                ['总加油量', stats.total_fuel.toFixed(2) + 'L'],
+                ['平均油价', '¥' + stats.average_price.toFixed(2) + '/L'],
+                ['总行驶里程', stats.total_distance.toFixed(2) + 'km'],
+                ['平均油耗', stats.average_consumption.toFixed(2) + 'L/100km']
+            ];
+            if (stats.first_date && stats.last_date) {
+                items.push(['记录期间', stats.first_date + ' 至 ' + stats.last_date]);
+            }
+            const list = document.getElementById('stats-list');
+            list.replaceChildren(...items.map(([label, value]) => {
+                const li = document.createElement('li');
+                const strong = document.createElement('strong');
+                strong.textContent = label + ':';
+                li.append(strong, ' ' + value);
+                return li;
+            }));
+        }
+        
+        function loadStats() {
+            fetch('/api/stats')
+            .then(response => response.json())
+            .then(renderStats)
+            .catch(error => {
+                console.error('Error:', error);
+                document.getElementById('stats-list').innerHTML = '<li>加载失败，请检查网络连接</li>';
+            });
         }
         
         // 添加记录表单提交
@@ -412,7 +584,9 @@ def index():
                 if (data.success) {
                     alert('记录添加成功！');
                     this.reset();
-                    location.reload(); // 刷新页面以显示新记录
+                    if (!liveUpdates) {
+                        location.reload(); // 浏览器不支持事件流时刷新页面
+                    }
                 } else {
                     alert('添加失败: ' + data.message);
                 }
@@ -424,20 +598,18 @@ def index():
         });
         
         // 删除记录函数
-        function deleteRecord(index) {
+        function deleteRecord(recordId) {
             if (confirm('确定要删除这条记录吗？此操作不可撤销。')) {
-                fetch('/api/delete_record', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({index: index})
+                fetch('/api/records/' + recordId, {
+                    method: 'DELETE'
                 })
                 .then(response => response.json())
                 .then(data => {
                     if (data.success) {
                         alert('记录删除成功！');
-                        location.reload(); // 刷新页面以更新记录列表
+                        if (!liveUpdates) {
+                            location.reload(); // 浏览器不支持事件流时刷新页面
+                        }
                     } else {
                         alert('删除失败: ' + data.message);
                     }
@@ -449,57 +621,530 @@ def index():
             }
         }
         
+        // 以下函数根据服务端推送的事件就地更新页面，不再整页刷新
+        const RECENT_LIMIT = 5;
+        
+        // 按 (日期, ID) 比较记录与表格行的先后，行 ID 形如 record-row-12
+        function compareToRow(record, row) {
+            const date = row.cells[0].textContent;
+            if (record.date !== date) {
+                return record.date < date ? -1 : 1;
+            }
+            return record.id - parseInt(row.id.split('-').pop(), 10);
+        }
+        
+        function updateStatCards(stats) {
+            document.getElementById('stat-total-records').textContent = stats.total_records;
+            document.getElementById('stat-total-cost').textContent = '¥' + stats.total_cost.toFixed(2);
+            document.getElementById('stat-total-distance').textContent = stats.total_distance.toFixed(2) + 'km';
+            document.getElementById('stat-average-consumption').textContent = stats.average_consumption.toFixed(2) + 'L/100km';
+        }
+        
+        // 最近记录按日期倒序，只保留前 RECENT_LIMIT 条
+        function insertRecentRow(record) {
+            const tbody = ensureTable('recent-content', ['日期', '里程(km)', '加油量(L)', '费用(¥)', '加油站', '操作']);
+            const rows = Array.from(tbody.rows);
+            let index = rows.findIndex(row => compareToRow(record, row) > 0);
+            if (index === -1) {
+                if (rows.length >= RECENT_LIMIT) {
+                    return;
+                }
+                index = rows.length;
+            }
+            const row = appendRow(tbody, [record.date, record.odometer, record.fuel_amount, record.cost,
+                record.station || '-', deleteButton(record.id)], index);
+            row.id = 'recent-row-' + record.id;
+            while (tbody.rows.length > RECENT_LIMIT) {
+                tbody.deleteRow(-1);
+            }
+        }
+        
+        function removeRecentRow(recordId) {
+            const row = document.getElementById('recent-row-' + recordId);
+            if (row) {
+                const tbody = row.parentNode;
+                row.remove();
+                if (tbody.rows.length === 0) {
+                    document.getElementById('recent-content').innerHTML = '<p>暂无加油记录</p>';
+                }
+            }
+        }
+        
+        // 加油记录按日期正序分页；新记录落在未加载的后续页时由"加载更多"取回
+        function insertRecordRow(record) {
+            if (!loadedTabs.records) {
+                return;
+            }
+            const tbody = ensureTable('records-content', ['日期', '里程(km)', '加油量(L)', '油价(¥/L)', '费用(¥)', '加油站', '备注', '操作']);
+            let index = Array.from(tbody.rows).findIndex(row => compareToRow(record, row) < 0);
+            if (index === -1) {
+                if (recordsCursor) {
+                    return;
+                }
+                index = tbody.rows.length;
+            }
+            const row = appendRow(tbody, [record.date, record.odometer, record.fuel_amount, record.fuel_price,
+                record.cost, record.station || '-', record.note || '-', deleteButton(record.id)], index);
+            row.id = 'record-row-' + record.id;
+        }
+        
+        function removeRecordRow(recordId) {
+            if (!loadedTabs.records) {
+                return;
+            }
+            if (recordsCursor === String(recordId)) {
+                // 游标指向的记录已删除，从第一页重新加载
+                reloadTab('records');
+                return;
+            }
+            const row = document.getElementById('record-row-' + recordId);
+            if (row) {
+                row.remove();
+            }
+        }
+        
+        // 清空已加载的标签页；当前正在查看时立即重新加载，否则等下次打开时加载
+        const tabResets = {
+            records: () => { recordsCursor = null; },
+            efficiency: () => { efficiencyOffset = 0; }
+        };
+        function reloadTab(tabName) {
+            if (!loadedTabs[tabName]) {
+                return;
+            }
+            tabResets[tabName]();
+            document.getElementById(tabName + '-content').innerHTML = '<p>加载中...</p>';
+            document.getElementById(tabName + '-more').style.display = 'none';
+            if (document.getElementById(tabName).classList.contains('active')) {
+                tabLoaders[tabName]();
+            } else {
+                loadedTabs[tabName] = false;
+            }
+        }
+        
+        // 事件流连接成功后才依赖推送更新页面，否则增删后刷新页面
+        let liveUpdates = false;
+        function connectEvents() {
+            if (!window.EventSource) {
+                return;
+            }
+            const source = new EventSource('/api/events');
+            source.addEventListener('open', () => { liveUpdates = true; });
+            source.addEventListener('error', () => {
+                // 服务端连接数已满（503）时浏览器不会自动重连，暂时改为刷新页面，稍后再试
+                if (source.readyState === EventSource.CLOSED) {
+                    liveUpdates = false;
+                    setTimeout(connectEvents, 60000);
+                }
+            });
+            source.addEventListener('record-added', e => {
+                const record = JSON.parse(e.data);
+                insertRecentRow(record);
+                insertRecordRow(record);
+                // 新记录会改变相邻区间的油耗，油耗详情整体重新加载
+                reloadTab('efficiency');
+            });
+            source.addEventListener('record-deleted', e => {
+                const recordId = JSON.parse(e.data).id;
+                removeRecentRow(recordId);
+                removeRecordRow(recordId);
+                reloadTab('efficiency');
+            });
+            source.addEventListener('stats-changed', e => {
+                const stats = JSON.parse(e.data);
+                updateStatCards(stats);
+                if (loadedTabs.stats) {
+                    renderStats(stats);
+                }
+            });
+            // 批量导入或错过了太多事件时，无法逐条修补，整页刷新
+            source.addEventListener('records-imported', () => location.reload());
+            source.addEventListener('resync', () => location.reload());
+        }
+        connectEvents();
+        
         // 设置默认日期为今天
         document.getElementById('date').value = new Date().toISOString().split('T')[0];
     </script>
 </body>
 </html>
+'''
+PAGE_PARTS = re.split(r'<!--(\w+)-->', PAGE_TEMPLATE)
+
+
+def render_page(fragments: Dict[str, str]) -> str:
+    """把各片段填入页面模板"""
+    return ''.join(fragments[part] if i % 2 else part for i, part in enumerate(PAGE_PARTS))
+
+
+class FragmentCache:
+    """按键缓存渲染好的 HTML，键不变时直接复用，键变化时重新渲染"""
+
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}
+
+    def get(self, name: str, key, render) -> str:
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        html = render()
+        self._entries[name] = (key, html)
+        return html
+
+
+fragment_cache = FragmentCache()
+
+
+def render_stats_cards(stats: Dict) -> str:
+    return f'''
+    <div class="stat-card">
+        <div class="stat-value" id="stat-total-records">{stats['total_records']}</div>
+        <div class="stat-label">总记录数</div>
+    </div>
+    <div class="stat-card">
+        <div class="stat-value" id="stat-total-cost">¥{stats['total_cost']:.2f}</div>
+        <div class="stat-label">总花费</div>
+    </div>
+    <div class="stat-card">
+        <div class="stat-value" id="stat-total-distance">{stats['total_distance']:.2f}km</div>
+        <div class="stat-label">总里程</div>
+    </div>
+    <div class="stat-card">
+        <div class="stat-value" id="stat-average-consumption">{stats['average_consumption']:.2f}L/100km</div>
+        <div class="stat-label">平均油耗</div>
+    </div>
     '''
-    
-    return html_template
 
 
-@app.route('/api/records')
+def render_recent_table(recent_records: List[Dict]) -> str:
+    if not recent_records:
+        return '<p>暂无加油记录</p>'
+    rows = []
+    for record in recent_records:
+        station = record['station'] if record['station'] else '-'
+        rows.append(f'''
+                <tr id="recent-row-{record['id']}">
+                    <td>{record['date']}</td>
+                    <td>{record['odometer']}</td>
+                    <td>{record['fuel_amount']}</td>
+                    <td>{record['cost']}</td>
+                    <td>{station}</td>
+                    <td><button onclick="deleteRecord({record['id']})" class="delete-btn">删除</button></td>
+                </tr>
+            ''')
+    return '''
+        <table>
+            <thead>
+                <tr>
+                    <th>日期</th>
+                    <th>里程(km)</th>
+                    <th>加油量(L)</th>
+                    <th>费用(¥)</th>
+                    <th>加油站</th>
+                    <th>操作</th>
+                </tr>
+            </thead>
+            <tbody>
+        ''' + ''.join(rows) + '''
+            </tbody>
+        </table>
+        '''
+
+
+def render_dashboard(today: str) -> str:
+    """渲染页面：只内嵌仪表盘，其余标签页由前端按需加载；片段按各自依赖的数据缓存"""
+    stats = tracker.get_statistics()
+    recent_records = tracker.get_recent_records(5)
+    # 记录内容不会被修改，最近记录的 ID 不变时表格也不变
+    recent_key = tuple(record['id'] for record in recent_records)
+
+    return render_page({
+        'stats_cards': fragment_cache.get('stats_cards', tuple(stats.values()), lambda: render_stats_cards(stats)),
+        'recent_table': fragment_cache.get('recent_table', recent_key, lambda: render_recent_table(recent_records)),
+        'today': today,
+    })
+
+
+@app.route('/')
+@conditional_get(daily=True)
+def index():
+    today = datetime.now().strftime('%Y-%m-%d')
+    return fragment_cache.get('page', (tracker.data_version, today), lambda: render_dashboard(today))
+
+
+# 单页最多返回的记录数
+MAX_PAGE_SIZE = 1000
+
+
+def int_arg(name: str, default: Optional[int] = None) -> Optional[int]:
+    """读取整数查询参数；与 type=int 不同，格式错误时抛出 ValueError 而不是当作没有传"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} 必须是整数: {value!r}")
+
+
+@api_route('/api/records')
+@conditional_get()
 def api_records():
-    return jsonify(tracker.get_records())
+    """记录列表，支持游标分页 (after, limit)、日期范围 (from, to)、加油站过滤 (station) 和字段投影 (fields)
+
+    不带参数时返回全部记录；还有下一页时通过 X-Next-Cursor 响应头返回游标
+    """
+    if not request.args:
+        return jsonify(current_tracker().get_records())
+    try:
+        after = int_arg('after')
+        limit = int_arg('limit')
+        if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit 必须在 1 到 {MAX_PAGE_SIZE} 之间")
+        fields = [f for f in request.args.get('fields', '').split(',') if f]
+        unknown = set(fields) - set(fuel_io.EXPORT_FIELDS)
+        if unknown:
+            raise ValueError(f"未知字段: {', '.join(sorted(unknown))}")
+        page, next_cursor = current_tracker().get_records_page(
+            after=after,
+            limit=limit,
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            station=request.args.get('station')
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except KeyError:
+        return jsonify({"success": False, "message": "游标对应的记录不存在，请重新从第一页开始"}), 400
+
+    if fields:
+        page = [{field: record[field] for field in fields} for record in page]
+    response = jsonify(page)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
+
+
+@api_route('/api/records/batch', methods=['POST'], creates_vehicle=True)
+def api_add_records_batch():
+    """批量导入：请求体为 CSV / JSON / NDJSON，整批校验通过后一次写入"""
+    fmt = request.args.get('format') or fuel_io.detect_format(content_type=request.content_type or '')
+    if fmt not in fuel_io.FORMATS:
+        return jsonify({"success": False, "message": "请通过 format 参数或 Content-Type 指定 csv、json 或 ndjson"}), 400
+
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    rows, errors = fuel_io.parse_records(stream, fmt)
+    if errors:
+        return jsonify({"success": False, "message": "数据校验失败，未导入任何记录", "errors": errors}), 400
+
+    added = current_tracker().add_records(rows)
+    if added is None:
+        return jsonify({"success": False, "message": "保存数据失败"}), 500
+    if added:
+        publish_change('records-imported', {"count": len(added)})
+    return jsonify({"success": True, "imported": len(added)})
+
+
+@api_route('/api/records/<int:record_id>', methods=['GET'])
+def api_get_record(record_id):
+    record = current_tracker().get_record(record_id)
+    if record is None:
+        return jsonify({"success": False, "message": "记录不存在"}), 404
+    return jsonify(record)
+
+
+@api_route('/api/records/<int:record_id>', methods=['DELETE'])
+def api_delete_record_by_id(record_id):
+    deleted_record = current_tracker().delete_record_by_id(record_id)
+    if deleted_record is None:
+        return jsonify({"success": False, "message": "记录不存在"}), 404
+    publish_change('record-deleted', {"id": record_id})
+    return jsonify({"success": True, "message": "记录已删除"})
+
+
+@api_route('/api/export')
+def api_export():
+    """流式导出全部记录，format 为 csv、ndjson 或 json"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in fuel_io.EXPORTERS:
+        return jsonify({"success": False, "message": "format 只能是 csv、ndjson 或 json"}), 400
+    body = fuel_io.EXPORTERS[fmt](current_tracker().iter_records())
+    filename = f"fuel_records_{datetime.now().strftime('%Y%m%d')}.{fmt}"
+    return Response(
+        stream_with_context(body),
+        content_type=fuel_io.MIME_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@app.route('/api/events')
+def api_events():
+    """Server-Sent Events 事件流：record-added、record-deleted、records-imported、stats-changed
+
+    断线重连时浏览器会带上 Last-Event-ID，服务端补发期间错过的事件；
+    错过的事件太多时发送 resync，页面整体刷新；连接数已达上限时返回 503，
+    浏览器的 EventSource 不再重连，页面改为增删后刷新
+    """
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscription = event_broker.subscribe(last_event_id)
+    if subscription is None:
+        response = jsonify({"success": False, "message": "实时更新连接数已满，请稍后再试"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    response = Response(
+        event_broker.stream(subscription, max_duration=app.config['EVENTS_MAX_DURATION']),
+        mimetype='text/event-stream',
+        # 关闭反向代理缓冲，事件才能立即送达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # 响应还没开始发送客户端就断开时生成器不会执行，也要注销连接
+    response.call_on_close(lambda: event_broker.unsubscribe(subscription[0]))
+    return response
 
 
-@app.route('/api/efficiency')
+@app.route('/api/vehicles')
+def api_vehicles():
+    """已有数据的车辆编号（含尚未加载到内存的车辆）"""
+    vehicles_dir = app.config['TRACKER_VEHICLES_DIR']
+    suffixes = [path[len(os.path.join(vehicles_dir, 'x')):] for path in vehicle_shard_files('x')]
+    vehicle_ids = set()
+    if os.path.isdir(vehicles_dir):
+        for name in os.listdir(vehicles_dir):
+            for suffix in suffixes:
+                if name.endswith(suffix) and VEHICLE_ID_PATTERN.fullmatch(name[:-len(suffix)]):
+                    vehicle_ids.add(name[:-len(suffix)])
+    return jsonify({"vehicles": sorted(vehicle_ids), "loaded": fleet.loaded_count()})
+
+
+@api_route('/api/efficiency')
+@conditional_get()
 def api_efficiency():
-    return jsonify(tracker.calculate_fuel_efficiency())
+    """油耗详情，支持 offset / limit 分页，还有下一页时通过 X-Next-Offset 响应头返回偏移量"""
+    efficiencies = current_tracker().calculate_fuel_efficiency()
+    if 'limit' not in request.args and 'offset' not in request.args:
+        return jsonify(efficiencies)
+    try:
+        offset = int_arg('offset', 0)
+        limit = int_arg('limit', MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"success": False, "message": f"offset 不能为负数，limit 必须在 1 到 {MAX_PAGE_SIZE} 之间"}), 400
+    response = jsonify(efficiencies[offset:offset + limit])
+    if offset + limit < len(efficiencies):
+        response.headers['X-Next-Offset'] = str(offset + limit)
+    return response
 
 
-@app.route('/api/stats')
+@api_route('/api/stats')
+@conditional_get()
 def api_stats():
-    return jsonify(tracker.get_statistics())
+    """统计信息；带 from / to（YYYY-MM-DD，含两端）时返回该日期区间内的花费、加油量和行驶距离合计"""
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    if date_from is None and date_to is None:
+        return jsonify(current_tracker().get_statistics())
+    try:
+        for value in (date_from, date_to):
+            if value is not None:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({"success": False, "message": "from / to 必须是 YYYY-MM-DD 格式的日期"}), 400
+    return jsonify(current_tracker().get_range_statistics(date_from, date_to))
+
+
+@api_route('/api/stats/monthly')
+@conditional_get()
+def api_stats_monthly():
+    """按月汇总的花费、加油量、行驶距离和油耗"""
+    return jsonify(current_tracker().get_monthly_statistics())
+
+
+@api_route('/api/stats/weekly')
+@conditional_get()
+def api_stats_weekly():
+    """按 ISO 周汇总，period 形如 2024-W09"""
+    return jsonify(current_tracker().get_weekly_statistics())
+
+
+@api_route('/api/stations')
+@conditional_get()
+def api_stations():
+    """各加油站的到访次数、加油量、平均油价和最近油价，平均油价最低的排在前面"""
+    return jsonify(current_tracker().get_station_statistics())
+
+
+@api_route('/api/stations/<path:name>/records')
+@conditional_get()
+def api_station_records(name):
+    """某个加油站的记录，分页参数 (after, limit, from, to) 与 /api/records 相同"""
+    if current_tracker().get_station(name) is None:
+        return jsonify({"success": False, "message": "加油站不存在"}), 404
+    try:
+        limit = int_arg('limit')
+        if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit 必须在 1 到 {MAX_PAGE_SIZE} 之间")
+        page, next_cursor = current_tracker().get_records_page(
+            after=int_arg('after'),
+            limit=limit,
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            station=name
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except KeyError:
+        return jsonify({"success": False, "message": "游标对应的记录不存在，请重新从第一页开始"}), 400
+    response = jsonify(page)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
+
+
+@api_route('/api/metrics')
+def api_metrics():
+    """持久化指标，其中 flush_lag_seconds 为最早一条未写入磁盘的修改已等待的时间"""
+    return jsonify(current_tracker().get_metrics())
 
 
-@app.route('/api/add_record', methods=['POST'])
+@api_route('/api/add_record', methods=['POST'], creates_vehicle=True)
 def api_add_record():
     try:
-        date = request.form.get('date')
+        date = (request.form.get('date') or '').strip()
+        try:
+            datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"success": False, "message": "日期必须是 YYYY-MM-DD 格式"}), 400
         odometer = float(request.form.get('odometer', 0))
         fuel_amount = float(request.form.get('fuel_amount', 0))
         fuel_price = float(request.form.get('fuel_price', 0))
         station = request.form.get('station', '')
         note = request.form.get('note', '')
         
-        tracker.add_record(date, odometer, fuel_amount, fuel_price, station, note)
+        record = current_tracker().add_record(date, odometer, fuel_amount, fuel_price, station, note)
+        if record is None:
+            return jsonify({"success": False, "message": "保存数据失败"}), 500
+        publish_change('record-added', record)
         
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 400
 
 
-@app.route('/api/delete_record', methods=['POST'])
+@api_route('/api/delete_record', methods=['POST'])
 def api_delete_record():
     try:
         data = request.get_json()
+        # 优先按 ID 删除，索引方式仅为兼容旧客户端保留
+        if 'id' in data:
+            return api_delete_record_by_id(int(data['id']))
         index = int(data.get('index', -1))
         
         if index >= 0:
-            deleted_record = tracker.delete_record(index)
+            deleted_record = current_tracker().delete_record(index)
             if deleted_record:
+                publish_change('record-deleted', {"id": deleted_record['id']})
                 return jsonify({"success": True, "message": "记录已删除"})
             else:
                 return jsonify({"success": False, "message": "无效的记录索引"}), 400
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+记录存储基准测试 - 比较字典列表和列式存储的每条记录内存占用与聚合速度
+
+用法: python benchmark_record_store.py [记录数]
+"""
+
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import fuel_vectorized
+from fuel_columns import ColumnarRecordStore
+from simple_fuel_tracker import FuelTrackerSimple
+
+
+def make_records(count: int) -> List[Dict]:
+    """生成模拟的加油记录"""
+    rng = random.Random(42)
+    stations = ["中石化", "中石油", "壳牌", "道达尔", ""]
+    start = date(2015, 1, 1)
+    odometer = 0.0
+    records = []
+    for i in range(count):
+        odometer += rng.uniform(300, 600)
+        fuel_amount = round(rng.uniform(20, 60), 2)
+        fuel_price = round(rng.uniform(6.5, 8.5), 2)
+        records.append({
+            "id": i + 1,
+            "date": (start + timedelta(days=i // 3)).isoformat(),
+            "odometer": round(odometer, 1),
+            "fuel_amount": fuel_amount,
+            "fuel_price": fuel_price,
+            "station": rng.choice(stations),
+            "note": "",
+            "cost": round(fuel_amount * fuel_price, 2)
+        })
+    return records
+
+
+def measure_memory(build: Callable[[], object]) -> Tuple[object, int]:
+    """返回构建结果和构建过程新增的内存（字节）"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def best_time(func: Callable[[], object], repeat: int = 5) -> float:
+    """多次运行取最快一次的耗时（毫秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(count: int):
+    source = make_records(count)
+    text = json.dumps(source, ensure_ascii=False)
+    # 与从数据文件加载时一样，每条记录都是独立的字典、浮点数和字符串
+    dict_records, dict_bytes = measure_memory(lambda: json.loads(text))
+
+    def build_columnar():
+        store = ColumnarRecordStore()
+        return store, [store.append(record) for record in source]
+
+    (store, views), columnar_bytes = measure_memory(build_columnar)
+
+    print(f"记录数: {count}")
+    print(f"字典列表: 每条记录 {dict_bytes / count:.0f} 字节")
+    print(f"列式存储: 每条记录 {columnar_bytes / count:.0f} 字节（含只读视图）")
+
+    dict_sum = best_time(lambda: sum(record["cost"] for record in dict_records))
+    column_sum = best_time(lambda: store.sum("cost"))
+    view_sum = best_time(lambda: sum(record["cost"] for record in views))
+    print(f"总花费求和: 字典 {dict_sum:.1f} ms, 列 {column_sum:.1f} ms, 逐条读视图 {view_sum:.1f} ms")
+
+    if fuel_vectorized.HAVE_NUMPY:
+        # 列直接作为 NumPy 数组使用（不复制），整套统计只有排序、差分和归约
+        np = fuel_vectorized.np
+        columns = [np.frombuffer(store.columns[field], dtype=float) for field in ("odometer", "fuel_amount", "cost")]
+        summary_time = best_time(lambda: fuel_vectorized.summarize(*columns))
+        print(f"NumPy 全量统计（列）: {summary_time:.1f} ms")
+
+    # 整个 tracker（含 ID、加油站索引和统计引擎）加载同一份数据文件
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "records.json")
+        with open(data_file, "w", encoding="utf-8") as f:
+            f.write(text)
+        for columnar in (False, True):
+            _, tracker_bytes = measure_memory(lambda: FuelTrackerSimple(data_file, columnar=columnar))
+            # tracemalloc 会明显拖慢加载，耗时单独测量
+            start = time.perf_counter()
+            FuelTrackerSimple(data_file, columnar=columnar)
+            elapsed = time.perf_counter() - start
+            label = "列式存储" if columnar else "字典列表"
+            print(f"FuelTrackerSimple({label}): 每条记录 {tracker_bytes / count:.0f} 字节, 加载 {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+列式记录存储 - 数值字段存放在 array 中，日期存为天序号，加油站和备注字符串去重，
+每条记录只保留一个轻量的只读视图，内存占用约为字典的几分之一
+"""
+
+from array import array
+from collections.abc import Mapping
+from datetime import date
+from itertools import compress
+from typing import Dict, Iterator, List
+
+FIELDS = ("id", "date", "odometer", "fuel_amount", "fuel_price", "station", "note", "cost")
+NUMERIC_FIELDS = ("odometer", "fuel_amount", "fuel_price", "cost")
+
+
+class RecordView(Mapping):
+    """一条记录的只读视图，用法与原来的记录字典相同（record["date"]、dict(record)、json.dumps(default=dict)）"""
+
+    __slots__ = ("_store", "_slot")
+
+    def __init__(self, store: "ColumnarRecordStore", slot: int):
+        self._store = store
+        self._slot = slot
+
+    def __getitem__(self, key: str):
+        return self._store.value(self._slot, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class ColumnarRecordStore:
+    """只追加的列式存储
+
+    删除只把该行标记为无效，不复用位置，已经交给调用方的视图始终有效；
+    重新加载或合并日志时整体重建
+    """
+
+    def __init__(self):
+        self.ids = array("q")
+        # 日期的天序号（date.toordinal），格式不合法的日期为 0，原文保存在 _raw_dates 中
+        self.days = array("i")
+        self.columns: Dict[str, array] = {field: array("d") for field in NUMERIC_FIELDS}
+        self.stations = array("I")
+        self.notes = array("I")
+        # 1 表示有效行，0 表示已删除
+        self.alive = bytearray()
+        self._strings: List[str] = []
+        self._string_index: Dict[str, int] = {}
+        self._date_strings: Dict[int, str] = {}
+        self._raw_dates: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _intern(self, text: str) -> int:
+        """字符串去重，返回在字符串表中的位置"""
+        index = self._string_index.get(text)
+        if index is None:
+            index = len(self._strings)
+            self._strings.append(text)
+            self._string_index[text] = index
+        return index
+
+    def append(self, record: Mapping) -> RecordView:
+        """写入一条记录，返回它的视图"""
+        slot = len(self.ids)
+        text = record["date"]
+        try:
+            parsed = date.fromisoformat(text)
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is not None and parsed.isoformat() == text:
+            day = parsed.toordinal()
+            # 同一天的日期字符串只保留一份
+            text = self._date_strings.setdefault(day, text)
+        else:
+            day = 0
+            self._raw_dates[slot] = text
+        self.ids.append(record["id"])
+        self.days.append(day)
+        for field, column in self.columns.items():
+            column.append(record[field])
+        self.stations.append(self._intern(record["station"]))
+        self.notes.append(self._intern(record["note"]))
+        self.alive.append(1)
+        return RecordView(self, slot)
+
+    def discard(self, view: RecordView):
+        """标记记录已删除"""
+        self.alive[view._slot] = 0
+
+    def value(self, slot: int, key: str):
+        column = self.columns.get(key)
+        if column is not None:
+            return column[slot]
+        if key == "id":
+            return self.ids[slot]
+        if key == "date":
+            day = self.days[slot]
+            return self._date_strings[day] if day else self._raw_dates[slot]
+        if key == "station":
+            return self._strings[self.stations[slot]]
+        if key == "note":
+            return self._strings[self.notes[slot]]
+        raise KeyError(key)
+
+    def live_count(self) -> int:
+        return self.alive.count(1)
+
+    def sum(self, field: str) -> float:
+        """对有效行的数值列求和，逐列扫描，不经过记录对象"""
+        return sum(compress(self.columns[field], self.alive))
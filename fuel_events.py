@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Server-Sent Events 推送 - 记录增删后把变化推送给所有打开的页面
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+def format_event(event_id: int, event: str, data: Dict) -> str:
+    """按 SSE 协议格式化一条事件"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=dict)
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+class EventBroker:
+    """进程内的事件分发：每个连接一个有界队列，断线重连时按 Last-Event-ID 补发
+
+    每个连接在整个保持时间内占用一个 worker 线程，max_subscribers 限制同时连接的数量，
+    给普通请求（包括产生事件的增删请求）留出线程；None 表示不限制
+    """
+
+    def __init__(self, history_size: int = 200, queue_size: int = 100, max_subscribers: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._subscribers: List[queue.Queue] = []
+        self._history: deque = deque(maxlen=history_size)
+        self._queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._last_id = 0
+
+    def publish(self, event: str, data: Dict):
+        """向所有连接推送事件"""
+        with self._lock:
+            self._last_id += 1
+            message = format_event(self._last_id, event, data)
+            self._history.append((self._last_id, message))
+            for subscriber in self._subscribers:
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    # 客户端消费太慢，丢弃积压的事件，让它重新加载页面
+                    self._drain(subscriber)
+                    subscriber.put_nowait(format_event(self._last_id, "resync", {}))
+
+    @staticmethod
+    def _drain(subscriber: queue.Queue):
+        try:
+            while True:
+                subscriber.get_nowait()
+        except queue.Empty:
+            pass
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Optional[Tuple[queue.Queue, List[str]]]:
+        """登记新连接，返回队列和需要补发的事件；连接数已达上限时返回 None"""
+        subscriber: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.append(subscriber)
+            if last_event_id is None or last_event_id == self._last_id:
+                return subscriber, []
+            oldest_id = self._history[0][0] if self._history else self._last_id + 1
+            if not oldest_id - 1 <= last_event_id < self._last_id:
+                # 断线太久，缺失的事件已不在历史中；或服务重启后事件编号已重新开始
+                return subscriber, [format_event(self._last_id, "resync", {})]
+            return subscriber, [message for event_id, message in self._history if event_id > last_event_id]
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        """注销连接，可以重复调用"""
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def stream(self, subscription: Tuple[queue.Queue, List[str]], heartbeat: float = 15,
+               max_duration: float = 300) -> Iterator[str]:
+        """生成 subscribe() 登记的连接的事件流，结束时注销连接
+
+        连接最多保持 max_duration 秒后主动断开，由浏览器 EventSource 自动重连，
+        避免长连接一直占用 worker
+        """
+        subscriber, backlog = subscription
+        deadline = time.monotonic() + max_duration
+        try:
+            yield "retry: 3000\n\n"
+            for message in backlog:
+                yield message
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    yield subscriber.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    # 注释行作为心跳，防止代理因空闲断开连接
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
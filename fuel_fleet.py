@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+多车辆分片 - 每辆车的数据保存在独立的分片（数据文件或数据库）中，首次访问时才加载，
+超过容量或空闲过久的分片按最近最少使用的顺序卸载，内存占用与车辆总数无关
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# 车辆编号会用作文件名，只允许字母、数字、下划线和连字符
+VEHICLE_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def validate_vehicle_id(vehicle_id: str) -> str:
+    """检查车辆编号，不合法时抛出 ValueError"""
+    if not isinstance(vehicle_id, str) or not VEHICLE_ID_PATTERN.fullmatch(vehicle_id):
+        raise ValueError("车辆编号只能包含字母、数字、下划线和连字符，长度不超过 64")
+    return vehicle_id
+
+
+class Shard:
+    """一辆车已加载（或正在加载）的存储"""
+
+    def __init__(self):
+        self.tracker: Any = None
+        self.error: Optional[Exception] = None
+        self.ready = threading.Event()
+        # 正在使用该分片的请求数，大于 0 时不会被卸载
+        self.leases = 0
+        self.last_used = time.monotonic()
+
+
+class FleetTracker:
+    """按车辆分片的存储集合
+
+    open_shard(车辆编号) 创建并加载该车辆的存储（FuelTrackerSimple 或 FuelTrackerSQLite），
+    shard_exists(车辆编号) 判断该车辆在磁盘上是否已有数据；最多同时加载 max_loaded 个分片，
+    超过 idle_timeout 秒未使用的分片在下次访问任意车辆时卸载
+    """
+
+    def __init__(self, open_shard: Callable[[str], Any], shard_exists: Callable[[str], bool],
+                 max_loaded: int = 64, idle_timeout: float = 600.0):
+        self._open_shard = open_shard
+        self._shard_exists = shard_exists
+        self.max_loaded = max_loaded
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # 车辆编号 -> 分片，按最近使用的先后排列，最久未用的在最前面
+        self._shards: "OrderedDict[str, Shard]" = OrderedDict()
+        # 正在卸载（写入剩余修改）的车辆，重新加载前要等卸载完成，避免读到旧数据
+        self._closing: Dict[str, threading.Event] = {}
+
+    def has_vehicle(self, vehicle_id: str) -> bool:
+        """车辆是否已有数据（已加载、正在卸载或磁盘上有分片）"""
+        vehicle_id = validate_vehicle_id(vehicle_id)
+        with self._lock:
+            if vehicle_id in self._shards or vehicle_id in self._closing:
+                return True
+        return self._shard_exists(vehicle_id)
+
+    @contextmanager
+    def lease(self, vehicle_id: str) -> Iterator[Any]:
+        """借用某辆车的存储（没有数据时新建），借用期间不会被卸载"""
+        shard = self._acquire(validate_vehicle_id(vehicle_id))
+        try:
+            yield shard.tracker
+        finally:
+            self._release(shard)
+
+    def _acquire(self, vehicle_id: str) -> Shard:
+        with self._lock:
+            shard = self._shards.get(vehicle_id)
+            loader = shard is None
+            if loader:
+                shard = self._shards[vehicle_id] = Shard()
+                closing = self._closing.get(vehicle_id)
+            self._shards.move_to_end(vehicle_id)
+            shard.leases += 1
+
+        if loader:
+            # 加载可能较慢，在全局锁之外进行；同一辆车的其他请求等待加载完成
+            try:
+                if closing is not None:
+                    closing.wait()
+                shard.tracker = self._open_shard(vehicle_id)
+            except Exception as e:
+                shard.error = e
+                with self._lock:
+                    if self._shards.get(vehicle_id) is shard:
+                        del self._shards[vehicle_id]
+            finally:
+                shard.ready.set()
+        else:
+            shard.ready.wait()
+
+        if shard.error is not None:
+            with self._lock:
+                shard.leases -= 1
+            raise shard.error
+        self._evict()
+        return shard
+
+    def _release(self, shard: Shard):
+        with self._lock:
+            shard.leases -= 1
+            shard.last_used = time.monotonic()
+
+    def _evict(self):
+        """卸载超出容量或空闲过久、且没有请求在使用的分片"""
+        now = time.monotonic()
+        evicted: List[tuple] = []
+        with self._lock:
+            remaining = len(self._shards)
+            for vehicle_id, shard in self._shards.items():
+                if remaining <= self.max_loaded and now - shard.last_used <= self.idle_timeout:
+                    # 后面的分片都比这个更近使用过
+                    break
+                if shard.leases or not shard.ready.is_set():
+                    continue
+                evicted.append((vehicle_id, shard))
+                remaining -= 1
+            for vehicle_id, shard in evicted:
+                del self._shards[vehicle_id]
+                self._closing[vehicle_id] = threading.Event()
+
+        for vehicle_id, shard in evicted:
+            try:
+                close = getattr(shard.tracker, "close", None)
+                if close is not None:
+                    # 延迟写入模式下写入剩余的修改并停止后台线程
+                    close()
+            except Exception as e:
+                print(f"卸载车辆 {vehicle_id} 的数据失败: {e}")
+            finally:
+                with self._lock:
+                    self._closing.pop(vehicle_id).set()
+
+    def loaded_count(self) -> int:
+        """当前加载在内存中的分片数"""
+        with self._lock:
+            return len(self._shards)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+加油记录导入导出工具 - 支持 CSV / JSON / NDJSON，逐行解析和校验，导出时分块生成
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import List, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+FORMATS = ("csv", "json", "ndjson")
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+EXTENSIONS = {
+    ".csv": "csv",
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+MIME_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+EXPORT_FIELDS = ["id", "date", "odometer", "fuel_amount", "fuel_price", "station", "note", "cost"]
+
+# 错误信息最多返回的条数，避免整批出错时响应过大
+MAX_ERRORS = 20
+
+# 导出时每个数据块包含的记录数
+EXPORT_CHUNK_SIZE = 500
+
+
+def detect_format(filename: str = "", content_type: str = "") -> Optional[str]:
+    """根据文件扩展名或 Content-Type 推断格式"""
+    for ext, fmt in EXTENSIONS.items():
+        if filename.lower().endswith(ext):
+            return fmt
+    mime = content_type.split(";")[0].strip().lower()
+    return CONTENT_TYPES.get(mime)
+
+
+def iter_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Dict]]:
+    """逐行读取原始数据，产出 (行号, 字段字典)"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "ndjson":
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError as e:
+                yield line_no, {"_error": f"JSON 格式错误: {e}"}
+    elif fmt == "json":
+        try:
+            data = json.load(stream)
+        except ValueError as e:
+            yield 1, {"_error": f"JSON 格式错误: {e}"}
+            return
+        if not isinstance(data, list):
+            yield 1, {"_error": "JSON 内容必须是记录数组"}
+            return
+        for index, row in enumerate(data, 1):
+            yield index, row
+    else:
+        raise ValueError(f"不支持的格式: {fmt}")
+
+
+def validate_row(row: Dict) -> Dict:
+    """校验并规范化一条记录，出错时抛出 ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError("记录必须是对象")
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    date = str(row.get("date") or "").strip()
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"日期格式错误: {date!r}")
+    values = {}
+    for field in ("odometer", "fuel_amount", "fuel_price"):
+        try:
+            values[field] = float(row.get(field))
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} 必须是数字: {row.get(field)!r}")
+        if values[field] < 0:
+            raise ValueError(f"{field} 不能为负数")
+    return {
+        "date": date,
+        "odometer": values["odometer"],
+        "fuel_amount": values["fuel_amount"],
+        "fuel_price": values["fuel_price"],
+        "station": str(row.get("station") or ""),
+        "note": str(row.get("note") or ""),
+    }
+
+
+def parse_records(stream: TextIO, fmt: str) -> Tuple[List[Dict], List[str]]:
+    """流式解析并校验整批记录，返回 (有效记录, 错误信息)；有任何错误时整批作废"""
+    rows: List[Dict] = []
+    errors: List[str] = []
+    for line_no, raw in iter_rows(stream, fmt):
+        try:
+            row = validate_row(raw)
+        except ValueError as e:
+            errors.append(f"第 {line_no} 行: {e}")
+            if len(errors) >= MAX_ERRORS:
+                break
+            continue
+        if not errors:
+            rows.append(row)
+    return ([] if errors else rows), errors
+
+
+def _chunked(records: Iterable[Dict], size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _dumps(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=dict)
+
+
+def iter_csv(records: Iterable[Dict]) -> Iterator[str]:
+    """逐块生成 CSV 文本"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for chunk in _chunked(records):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(records: Iterable[Dict]) -> Iterator[str]:
+    """逐块生成 NDJSON 文本"""
+    for chunk in _chunked(records):
+        yield "".join(_dumps(record) + "\n" for record in chunk)
+
+
+def iter_json(records: Iterable[Dict]) -> Iterator[str]:
+    """逐块生成 JSON 数组文本"""
+    yield "["
+    first = True
+    for chunk in _chunked(records):
+        body = ",".join(_dumps(record) for record in chunk)
+        yield body if first else "," + body
+        first = False
+    yield "]"
+
+
+EXPORTERS = {
+    "csv": iter_csv,
+    "json": iter_json,
+    "ndjson": iter_ndjson,
+}
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+读写锁 - 多线程共享 tracker 时使用：读操作可以并发，写操作独占；
+文件锁 - 多个进程共享同一份数据文件时协调写入
+"""
+
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows 上没有 fcntl，只能保证进程内的互斥
+    fcntl = None
+
+
+class ReadWriteLock:
+    """写者优先的读写锁
+
+    有写者等待时新的读者让行，避免写者饿死；持有写锁的线程可以再次获取读锁或写锁
+    （写操作内部会调用读方法），但读锁不可重入，持有读锁时也不能升级为写锁
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writers_waiting = 0
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+
+    @contextmanager
+    def read_lock(self) -> Iterator[None]:
+        """获取读锁"""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                # 写锁持有者直接读取
+                self._write_depth += 1
+            else:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                if self._writer == me:
+                    self._write_depth -= 1
+                else:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        """获取写锁，等待所有读者退出"""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+            else:
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = me
+                self._write_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+class FileLock:
+    """基于 flock 的跨进程建议锁
+
+    同一线程可以重复加锁（嵌套时直接复用外层的锁）；进程内线程之间的互斥仍由 ReadWriteLock 负责
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._held = threading.local()
+
+    @contextmanager
+    def acquire(self, exclusive: bool = True) -> Iterator[None]:
+        """获取文件锁，exclusive=False 时为共享锁，用于读取数据文件"""
+        if fcntl is None or getattr(self._held, "depth", 0):
+            self._held.depth = getattr(self._held, "depth", 0) + 1
+            try:
+                yield
+            finally:
+                self._held.depth -= 1
+            return
+        with open(self.path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._held.depth = 1
+            try:
+                yield
+            finally:
+                self._held.depth = 0
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_locked(method):
+    """方法装饰器：在 self._lock 的读锁内执行"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.read_lock():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def write_locked(method):
+    """方法装饰器：在 self._lock 的写锁内执行"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.write_lock():
+            return method(self, *args, **kwargs)
+    return wrapper
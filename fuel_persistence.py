@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+持久化工具 - 原子写入（临时文件 + 重命名）和组提交（并发写操作合并为一次物理写入）
+"""
+
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+
+def fsync_directory(path: str):
+    """同步文件所在目录，保证新建或重命名的目录项落盘；不支持的平台上忽略"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, data: bytes, fsync: bool = True):
+    """先写同目录下的临时文件再重命名覆盖，崩溃时旧文件保持完整"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if fsync:
+        fsync_directory(path)
+
+
+class CommitSlot:
+    """组提交中的一个写操作及其结果"""
+
+    def __init__(self, operation: Callable[[], Any]):
+        self.operation = operation
+        self.done = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> Any:
+        """执行操作，异常留给提交该操作的线程抛出"""
+        try:
+            self.result = self.operation()
+        except Exception as e:
+            self.error = e
+        return self.result
+
+
+class GroupCommit:
+    """组提交：第一个到达的线程成为提交者，把等待中的写操作一起交给 commit_batch，只写一次磁盘
+
+    window 为提交者等待更多写操作加入的时间（秒），0 表示不等待，只合并提交期间排队的操作
+    """
+
+    def __init__(self, commit_batch: Callable[[List[CommitSlot]], None], window: float = 0.0):
+        self.commit_batch = commit_batch
+        self.window = window
+        self._cond = threading.Condition()
+        self._pending: List[CommitSlot] = []
+        self._committing = False
+
+    def submit(self, operation: Callable[[], Any]) -> Any:
+        """提交写操作并等待它写入磁盘，返回操作的结果"""
+        slot = CommitSlot(operation)
+        with self._cond:
+            self._pending.append(slot)
+            while not slot.done and self._committing:
+                self._cond.wait()
+            if not slot.done:
+                self._committing = True
+        if not slot.done:
+            self._lead()
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
+
+    def _lead(self):
+        """作为提交者处理一批写操作"""
+        batch: List[CommitSlot] = []
+        try:
+            if self.window:
+                time.sleep(self.window)
+            with self._cond:
+                batch, self._pending = self._pending, []
+            try:
+                self.commit_batch(batch)
+            except Exception as e:
+                for slot in batch:
+                    if slot.error is None:
+                        slot.error = e
+        finally:
+            with self._cond:
+                for slot in batch:
+                    slot.done = True
+                self._committing = False
+                # 唤醒等待者：已完成的返回结果，其余的由其中一个接任提交者
+                self._cond.notify_all()
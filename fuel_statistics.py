@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+增量统计引擎 - 在增删记录时维护累计值和油耗序列，读取统计信息为 O(1)
+"""
+
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import date
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+
+import fuel_vectorized
+
+
+# 总花费和总加油量的累计单位（百万分之一）
+MICRO = 1_000_000
+
+
+def to_micro(value: float) -> int:
+    return round(value * MICRO)
+
+
+def driven_centi(record: Dict, prev_record: Optional[Dict]) -> int:
+    """与上一次加油（按日期）之间的里程差，以 0.01 km 为单位；没有上一条或里程回退时为 0"""
+    if prev_record is None:
+        return 0
+    driven = record["odometer"] - prev_record["odometer"]
+    return round(driven * 100) if driven > 0 else 0
+
+
+def build_segment(prev_record: Dict, curr_record: Dict) -> Optional[Dict]:
+    """相邻两次加油（按里程）之间的油耗条目，无效区间返回 None"""
+    distance = curr_record["odometer"] - prev_record["odometer"]
+    fuel_used = curr_record["fuel_amount"]
+    if distance > 0 and fuel_used > 0:
+        efficiency = distance / fuel_used  # km/L
+        consumption = (fuel_used / distance) * 100  # L/100km
+        return {
+            "date": curr_record["date"],
+            "distance": round(distance, 2),
+            "fuel_used": round(fuel_used, 2),
+            "efficiency_km_per_l": round(efficiency, 2),
+            "consumption_l_per_100km": round(consumption, 2),
+            "from_odometer": prev_record["odometer"],
+            "to_odometer": curr_record["odometer"]
+        }
+    return None
+
+
+class RunningStatistics:
+    def __init__(self, records: Optional[List[Dict]] = None):
+        # 油耗序列版本号，只在序列内容变化时递增，用于判断缓存是否过期
+        self.efficiency_version = 0
+        self.reset(records or [])
+
+    def reset(self, records: List[Dict]):
+        """用全部记录重建累计值"""
+        self.efficiency_version += 1
+        self._efficiency_cache: Optional[List[Dict]] = None
+        self._efficiency_cache_version = 0
+        # 单段油耗已保留两位小数，以 0.01 为单位用整数累计，增删多次也不会漂移
+        self.consumption_centi_sum = 0
+        self.consumption_count = 0
+        if fuel_vectorized.HAVE_NUMPY and len(records) >= fuel_vectorized.MIN_RECORDS:
+            self._reset_vectorized(records)
+            return
+
+        # 按 (里程, 日期, ID) 排序的记录，与原先按日期列表稳定排序的顺序一致
+        self._by_odometer: List[Dict] = sorted(records, key=self._key)
+        # _segments[i] 为第 i-1 条到第 i 条记录之间的油耗条目，与 _by_odometer 一一对应
+        self._segments: List[Optional[Dict]] = [None] * len(self._by_odometer)
+
+        # 总花费和总加油量同样用整数累计，反复增删后不会留下 1e-15 之类的残差，导致平均油价为负
+        self.total_cost_micro = sum([round(record["cost"] * MICRO) for record in records])
+        self.total_fuel_micro = sum([round(record["fuel_amount"] * MICRO) for record in records])
+        for i in range(1, len(self._by_odometer)):
+            self._set_segment(i)
+
+    def _reset_vectorized(self, records: List[Dict]):
+        """用 NumPy 一次算出排序、全部区间和累计值，结果与逐条计算相同"""
+        self._by_odometer, positions, segments, self.consumption_centi_sum = fuel_vectorized.build_segments(records)
+        self._segments = [None] * len(self._by_odometer)
+        for pos, segment in zip(positions, segments):
+            self._segments[pos] = segment
+        self.consumption_count = len(segments)
+        self.total_cost_micro = fuel_vectorized.scaled_total([record["cost"] for record in records], MICRO)
+        self.total_fuel_micro = fuel_vectorized.scaled_total([record["fuel_amount"] for record in records], MICRO)
+
+    @staticmethod
+    def _key(record: Dict) -> Tuple[float, str, int]:
+        return (record["odometer"], record["date"], record["id"])
+
+    def _drop_segment(self, pos: int):
+        """移出以第 pos 条记录结尾的区间"""
+        old = self._segments[pos]
+        if old is not None:
+            self.consumption_centi_sum -= int(round(old["consumption_l_per_100km"] * 100))
+            self.consumption_count -= 1
+            self._segments[pos] = None
+            self.efficiency_version += 1
+
+    def _set_segment(self, pos: int):
+        """重新计算以第 pos 条记录结尾的区间，并更新油耗累计值"""
+        new = build_segment(self._by_odometer[pos - 1], self._by_odometer[pos]) if pos > 0 else None
+        if new == self._segments[pos]:
+            return
+        self._drop_segment(pos)
+        if new is not None:
+            self.consumption_centi_sum += int(round(new["consumption_l_per_100km"] * 100))
+            self.consumption_count += 1
+            self._segments[pos] = new
+            self.efficiency_version += 1
+
+    def add(self, record: Dict):
+        """计入一条新记录，只重新计算相邻的两段区间"""
+        pos = bisect_left(self._by_odometer, self._key(record), key=self._key)
+        self._by_odometer.insert(pos, record)
+        self._segments.insert(pos, None)
+
+        # 新记录把原来的一段区间拆成两段
+        self._set_segment(pos)
+        if pos + 1 < len(self._by_odometer):
+            self._set_segment(pos + 1)
+
+        self.total_cost_micro += to_micro(record["cost"])
+        self.total_fuel_micro += to_micro(record["fuel_amount"])
+
+    def remove(self, record: Dict):
+        """移除一条记录，相邻的两段区间合并为一段"""
+        pos = bisect_left(self._by_odometer, self._key(record), key=self._key)
+        if pos == len(self._by_odometer) or self._by_odometer[pos] is not record:
+            return
+
+        if len(self._by_odometer) == 1:
+            # 清空时归零，避免浮点累计误差残留
+            self.reset([])
+            return
+
+        # 先移出以该记录结尾的区间，再删除记录并重算后一段
+        self._drop_segment(pos)
+        del self._by_odometer[pos]
+        del self._segments[pos]
+        if pos < len(self._by_odometer):
+            self._set_segment(pos)
+
+        self.total_cost_micro -= to_micro(record["cost"])
+        self.total_fuel_micro -= to_micro(record["fuel_amount"])
+
+    def efficiency_series(self) -> List[Dict]:
+        """按里程排序的油耗序列，数据未变化时直接返回缓存（调用方不要修改）"""
+        if self._efficiency_cache is None or self._efficiency_cache_version != self.efficiency_version:
+            self._efficiency_cache = [segment for segment in self._segments if segment is not None]
+            self._efficiency_cache_version = self.efficiency_version
+        return self._efficiency_cache
+
+    def snapshot(self) -> Dict:
+        """返回与 get_statistics 相同格式的统计信息"""
+        count = len(self._by_odometer)
+        if not count:
+            return {
+                "total_records": 0,
+                "total_cost": 0,
+                "total_fuel": 0,
+                "average_price": 0,
+                "total_distance": 0,
+                "average_consumption": 0,
+                "first_date": None,
+                "last_date": None
+            }
+
+        first_record = self._by_odometer[0]
+        last_record = self._by_odometer[-1]
+        avg_price = self.total_cost_micro / self.total_fuel_micro if self.total_fuel_micro > 0 else 0
+        total_distance = last_record["odometer"] - first_record["odometer"] if count > 1 else 0
+        avg_consumption = self.consumption_centi_sum / self.consumption_count / 100 if self.consumption_count else 0
+
+        return {
+            "total_records": count,
+            "total_cost": round(self.total_cost_micro / MICRO, 2),
+            "total_fuel": round(self.total_fuel_micro / MICRO, 2),
+            "average_price": round(avg_price, 2),
+            "total_distance": round(total_distance, 2),
+            "average_consumption": round(avg_consumption, 2) if avg_consumption > 0 else 0,
+            "first_date": first_record["date"],
+            "last_date": last_record["date"]
+        }
+
+
+class DateRangeSums:
+    """按日期排序的前缀和，任意日期区间的花费、加油量和行驶距离为两次二分加一次相减
+
+    前缀和只在水位以内有效：增删记录把水位降到变化的位置，查询时才补算需要的部分，
+    在末尾追加记录（最常见的情况）不会让已有的前缀失效
+    """
+
+    def __init__(self):
+        # 查询时补算前缀会修改数组，多个读者可能同时查询
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空前缀和，下次查询时从头计算"""
+        with self._lock:
+            # 第 k 项为按日期排序的前 k 条记录的合计；花费和加油量以百万分之一为单位，距离以 0.01 km 为单位
+            self._cost = array("q", [0])
+            self._fuel = array("q", [0])
+            self._distance = array("q", [0])
+
+    def invalidate(self, pos: int):
+        """第 pos 条及之后的记录发生了变化（行驶距离依赖前一条记录，后面的也一并失效）"""
+        with self._lock:
+            if pos + 1 < len(self._cost):
+                del self._cost[pos + 1:]
+                del self._fuel[pos + 1:]
+                del self._distance[pos + 1:]
+
+    def _extend(self, records: List[Dict], upto: int):
+        """把前缀和补算到前 upto 条记录"""
+        cost, fuel, distance = self._cost[-1], self._fuel[-1], self._distance[-1]
+        for i in range(len(self._cost) - 1, upto):
+            record = records[i]
+            cost += to_micro(record["cost"])
+            fuel += to_micro(record["fuel_amount"])
+            distance += driven_centi(record, records[i - 1] if i else None)
+            self._cost.append(cost)
+            self._fuel.append(fuel)
+            self._distance.append(distance)
+
+    def totals(self, records: List[Dict], start: int, end: int) -> Tuple[int, int, int]:
+        """records[start:end] 的 (花费, 加油量, 行驶距离) 合计，单位与前缀和相同"""
+        with self._lock:
+            if end >= len(self._cost):
+                self._extend(records, end)
+            return (self._cost[end] - self._cost[start],
+                    self._fuel[end] - self._fuel[start],
+                    self._distance[end] - self._distance[start])
+
+
+@lru_cache(maxsize=4096)
+def iso_week_and_month(date_text: str) -> Tuple[str, str]:
+    """日期 -> (ISO 周, 月份)，如 ("2024-W09", "2024-03")，ISO 周的年份可能与日历年不同；
+    日期格式不合法时都为 unknown"""
+    try:
+        day = date.fromisoformat(date_text)
+    except (TypeError, ValueError):
+        return "unknown", "unknown"
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}", f"{day.year}-{day.month:02d}"
+
+
+class PeriodRollups:
+    """按月和按 ISO 周汇总的记录数、花费、加油量、行驶距离和油耗
+
+    行驶距离的算法与 DateRangeSums 相同（与上一次加油的里程差），增删一条记录只会影响它自己
+    和按日期紧随其后的那条记录，所以只需调整这两条记录所在的桶
+    """
+
+    # 每个桶: [记录数, 花费(百万分之一), 加油量(百万分之一), 行驶距离(0.01 km), 有行驶距离的那几次加油的加油量(百万分之一)]
+    def __init__(self):
+        self.monthly: Dict[str, List[int]] = {}
+        self.weekly: Dict[str, List[int]] = {}
+
+    def reset(self, records: List[Dict]):
+        """用按日期排序的全部记录重建"""
+        self.monthly = {}
+        self.weekly = {}
+        # 记录按日期排序，先在局部变量中累计同一天的记录，日期变化时再一起计入所在的月、周
+        current_date = None
+        count = cost = fuel = distance = segment_fuel = 0
+        prev = None
+        for record in records:
+            if record["date"] != current_date:
+                if count:
+                    self.add_day_totals(current_date, (count, cost, fuel, distance, segment_fuel))
+                current_date = record["date"]
+                count = cost = fuel = distance = segment_fuel = 0
+            micro_fuel = to_micro(record["fuel_amount"])
+            driven = driven_centi(record, prev)
+            count += 1
+            cost += to_micro(record["cost"])
+            fuel += micro_fuel
+            if driven:
+                distance += driven
+                segment_fuel += micro_fuel
+            prev = record
+        if count:
+            self.add_day_totals(current_date, (count, cost, fuel, distance, segment_fuel))
+
+    def add_day_totals(self, date_text: str, totals: Tuple[int, ...]):
+        """把某一天的合计（格式同桶）计入所在的月、周"""
+        week, month = iso_week_and_month(date_text)
+        for table, key in ((self.weekly, week), (self.monthly, month)):
+            bucket = table.setdefault(key, [0, 0, 0, 0, 0])
+            for i, value in enumerate(totals):
+                bucket[i] += value
+
+    def _buckets(self, record: Dict) -> Tuple[List[int], List[int]]:
+        week, month = iso_week_and_month(record["date"])
+        return self.weekly.setdefault(week, [0, 0, 0, 0, 0]), self.monthly.setdefault(month, [0, 0, 0, 0, 0])
+
+    def _apply(self, record: Dict, prev: Optional[Dict], sign: int, distance_only: bool = False):
+        """把一条记录的贡献计入（sign=1）或移出（sign=-1）所在的月、周；distance_only 时只调整行驶距离部分"""
+        driven = driven_centi(record, prev)
+        fuel = to_micro(record["fuel_amount"])
+        for bucket in self._buckets(record):
+            if not distance_only:
+                bucket[0] += sign
+                bucket[1] += sign * to_micro(record["cost"])
+                bucket[2] += sign * fuel
+            if driven:
+                bucket[3] += sign * driven
+                bucket[4] += sign * fuel
+        if sign < 0 and not distance_only:
+            self._discard_empty(record)
+
+    def _discard_empty(self, record: Dict):
+        week, month = iso_week_and_month(record["date"])
+        for table, key in ((self.weekly, week), (self.monthly, month)):
+            if not table[key][0]:
+                del table[key]
+
+    def add(self, records: List[Dict], pos: int):
+        """记录已插入到 records[pos]"""
+        record = records[pos]
+        prev = records[pos - 1] if pos else None
+        if pos + 1 < len(records):
+            # 后一条记录的上一次加油变成了新记录
+            following = records[pos + 1]
+            self._apply(following, prev, -1, distance_only=True)
+            self._apply(following, record, 1, distance_only=True)
+        self._apply(record, prev, 1)
+
+    def remove(self, records: List[Dict], pos: int, record: Dict):
+        """记录已从 records[pos] 删除"""
+        prev = records[pos - 1] if pos else None
+        self._apply(record, prev, -1)
+        if pos < len(records):
+            following = records[pos]
+            self._apply(following, record, -1, distance_only=True)
+            self._apply(following, prev, 1, distance_only=True)
+
+    @staticmethod
+    def summarize(table: Dict[str, List[int]]) -> List[Dict]:
+        """按时间顺序输出各个桶；油耗为有行驶距离的加油量 / 行驶距离 × 100"""
+        return [
+            {
+                "period": period,
+                "total_records": count,
+                "total_cost": round(cost / MICRO, 2),
+                "total_fuel": round(fuel / MICRO, 2),
+                "total_distance": round(distance / 100, 2),
+                "average_consumption": round(segment_fuel / MICRO / (distance / 100) * 100, 2) if distance > 0 else 0
+            }
+            for period, (count, cost, fuel, distance, segment_fuel) in sorted(table.items())
+        ]
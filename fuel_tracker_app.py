@@ -5,14 +5,31 @@
 用于记录加油情况和计算油耗
 """
 
+import argparse
 import json
 import os
+import sys
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Sequence, Tuple
+
+import fuel_io
+import fuel_vectorized
+from fuel_persistence import atomic_write
+
+
+# 记录字段的顺序，to_row / from_row 和数据文件中的行都按这个顺序
+FIELDS = ("id", "date", "odometer", "fuel_amount", "fuel_price", "station", "note", "cost")
+# 按行保存的数据文件格式标记；没有标记的旧数据文件是字典列表
+ROW_FORMAT = "fuel-records-rows/1"
 
 
 class FuelRecord:
-    def __init__(self, date: str, odometer: float, fuel_amount: float, fuel_price: float, station: str = "", note: str = ""):
+    # 不为每条记录创建 __dict__，大量记录时占用的内存少得多
+    __slots__ = FIELDS
+
+    def __init__(self, date: str, odometer: float, fuel_amount: float, fuel_price: float, station: str = "", note: str = "", record_id: Optional[int] = None):
+        self.id = record_id
         self.date = date
         self.odometer = odometer
         self.fuel_amount = fuel_amount
@@ -21,20 +38,24 @@ class FuelRecord:
         self.note = note
         self.cost = fuel_amount * fuel_price
 
+    def to_row(self) -> Tuple:
+        """按 FIELDS 顺序返回字段值"""
+        return (self.id, self.date, self.odometer, self.fuel_amount, self.fuel_price, self.station, self.note, self.cost)
+
+    @classmethod
+    def from_row(cls, row: Sequence):
+        """从 to_row 的结果（或数据文件中的一行）恢复记录"""
+        record_id, date, odometer, fuel_amount, fuel_price, station, note, cost = row
+        record = cls(date, odometer, fuel_amount, fuel_price, station, note, record_id)
+        record.cost = cost
+        return record
+
     def to_dict(self):
-        return {
-            "date": self.date,
-            "odometer": self.odometer,
-            "fuel_amount": self.fuel_amount,
-            "fuel_price": self.fuel_price,
-            "station": self.station,
-            "note": self.note,
-            "cost": self.cost
-        }
+        return dict(zip(FIELDS, self.to_row()))
 
     @classmethod
     def from_dict(cls, data):
-        record = cls(data["date"], data["odometer"], data["fuel_amount"], data["fuel_price"], data["station"], data["note"])
+        record = cls(data["date"], data["odometer"], data["fuel_amount"], data["fuel_price"], data["station"], data["note"], data.get("id"))
         record.cost = data["cost"]
         return record
 
@@ -43,37 +64,101 @@ class FuelTrackerApp:
     def __init__(self, data_file: str = "fuel_records.json"):
         self.data_file = data_file
         self.records: List[FuelRecord] = []
+        # 记录 ID -> 记录，删除时不依赖会随排序变化的列表索引
+        self.records_by_id: Dict[int, FuelRecord] = {}
+        # records 对应的字典列表，get_records 和 save_data 共用，增删时同步修改，None 表示需要重建
+        self._dict_view: Optional[List[Dict]] = None
+        self.next_id = 1
         self.load_data()
 
     def load_data(self):
         """从文件加载数据"""
+        # 按行保存的文件记有下一个 ID，最大 ID 的记录被删除后也不会重复分配
+        stored_next_id = 1
         if os.path.exists(self.data_file):
             try:
                 with open(self.data_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    self.records = [FuelRecord.from_dict(record) for record in data]
+                self.records = self._decode(data)
+                if isinstance(data, dict):
+                    stored_next_id = int(data.get("next_id", 1))
             except Exception as e:
                 print(f"加载数据失败: {e}")
                 self.records = []
+        # 旧版本保存的数据不一定按日期排列；已经有序时 Timsort 只需线性时间
+        self.records.sort(key=lambda x: x.date)
+        # 为旧数据补充 ID 并建立索引
+        self.next_id = max(max((r.id for r in self.records if r.id is not None), default=0) + 1, stored_next_id)
+        for record in self.records:
+            if record.id is None:
+                record.id = self.next_id
+                self.next_id += 1
+        self.records_by_id = {record.id: record for record in self.records}
+        self._dict_view = None
+
+    def _record_dicts(self) -> List[Dict]:
+        """与 records 顺序一致的字典列表，只在需要时整体生成一次（调用方不要修改）"""
+        if self._dict_view is None:
+            self._dict_view = [dict(zip(FIELDS, record.to_row())) for record in self.records]
+        return self._dict_view
+
+    @staticmethod
+    def _decode(data) -> List[FuelRecord]:
+        """数据文件内容 -> 记录列表，支持按行保存的格式和旧版的字典列表"""
+        if isinstance(data, list):
+            return [FuelRecord.from_dict(record) for record in data]
+        if data.get("format") != ROW_FORMAT:
+            raise ValueError(f"未知的数据文件格式: {data.get('format')}")
+        if tuple(data["fields"]) == FIELDS:
+            return [FuelRecord.from_row(row) for row in data["rows"]]
+        # 字段顺序与当前版本不同时按字段名对应
+        return [FuelRecord.from_dict(dict(zip(data["fields"], row))) for row in data["rows"]]
 
     def save_data(self):
-        """保存数据到文件"""
+        """保存数据到文件：每条记录保存为按 FIELDS 顺序的一行值，不再逐条生成字典"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump([record.to_dict() for record in self.records], f, ensure_ascii=False, indent=2)
+            rows = ",\n".join(json.dumps(record.to_row(), ensure_ascii=False) for record in self.records)
+            # 每条记录占一行，整个文件仍是合法的 JSON；先写临时文件再替换，写到一半出错时原文件保持完整
+            data = (f'{{"format": "{ROW_FORMAT}", "next_id": {self.next_id}, "fields": {json.dumps(FIELDS)}, '
+                    f'"rows": [\n{rows}\n]}}\n')
+            atomic_write(self.data_file, data.encode('utf-8'))
         except Exception as e:
             print(f"保存数据失败: {e}")
 
     def add_record(self, date: str, odometer: float, fuel_amount: float, fuel_price: float, station: str = "", note: str = ""):
         """添加加油记录"""
-        record = FuelRecord(date, odometer, fuel_amount, fuel_price, station, note)
-        self.records.append(record)
-        self.records.sort(key=lambda x: x.date)  # 按日期排序
+        record = FuelRecord(date, odometer, fuel_amount, fuel_price, station, note, self.next_id)
+        self.next_id += 1
+        self.records_by_id[record.id] = record
+        # 按日期有序插入，字典列表在同一位置插入，不必整体重建
+        index = bisect_right(self.records, record.date, key=lambda x: x.date)
+        self.records.insert(index, record)
+        if self._dict_view is not None:
+            self._dict_view.insert(index, record.to_dict())
         self.save_data()
         return record
 
+    def add_records(self, rows: Iterable[Dict]) -> List[FuelRecord]:
+        """批量添加记录：整批只排序一次、写入一次"""
+        new_records = []
+        for row in rows:
+            record = FuelRecord(row["date"], float(row["odometer"]), float(row["fuel_amount"]), float(row["fuel_price"]),
+                                row.get("station", ""), row.get("note", ""), self.next_id)
+            self.next_id += 1
+            new_records.append(record)
+        for record in new_records:
+            self.records_by_id[record.id] = record
+        self.records.extend(new_records)
+        self.records.sort(key=lambda x: x.date)
+        self._dict_view = None
+        self.save_data()
+        return new_records
+
     def calculate_fuel_efficiency(self) -> List[Dict]:
         """计算每次加油的油耗"""
+        if fuel_vectorized.HAVE_NUMPY and len(self.records) >= fuel_vectorized.MIN_RECORDS:
+            return self._calculate_fuel_efficiency_vectorized()
+
         results = []
         sorted_records = sorted(self.records, key=lambda x: x.odometer)
 
@@ -100,11 +185,53 @@ class FuelTrackerApp:
 
         return results
 
+    def _calculate_fuel_efficiency_vectorized(self) -> List[Dict]:
+        """与 calculate_fuel_efficiency 结果相同，区间的差值、筛选和油耗用数组一次算出"""
+        np = fuel_vectorized.np
+        odometers = np.array([record.odometer for record in self.records], dtype=float)
+        fuel_amounts = np.array([record.fuel_amount for record in self.records], dtype=float)
+        order = np.argsort(odometers, kind="stable")
+        positions, distance, fuel_used = fuel_vectorized.segment_arrays(odometers[order], fuel_amounts[order])
+        efficiency = fuel_vectorized.round_like_python(distance / fuel_used)
+        consumption = fuel_vectorized.round_like_python((fuel_used / distance) * 100)
+
+        sorted_records = [self.records[i] for i in order.tolist()]
+        return [
+            {
+                "date": sorted_records[pos].date,
+                "distance": d,
+                "fuel_used": f,
+                "efficiency_km_per_l": e,
+                "consumption_l_per_100km": c,
+                "from_odometer": sorted_records[pos - 1].odometer,
+                "to_odometer": sorted_records[pos].odometer
+            }
+            for pos, d, f, e, c in zip(positions.tolist(), distance.tolist(), fuel_used.tolist(),
+                                       efficiency.tolist(), consumption.tolist())
+        ]
+
     def get_statistics(self) -> Dict:
         """获取统计信息"""
         if not self.records:
             return {"total_records": 0}
 
+        if fuel_vectorized.HAVE_NUMPY and len(self.records) >= fuel_vectorized.MIN_RECORDS:
+            # 只做归约，不生成逐段油耗条目
+            summary = fuel_vectorized.summarize([record.odometer for record in self.records],
+                                                [record.fuel_amount for record in self.records],
+                                                [record.cost for record in self.records])
+            total_fuel = summary["total_fuel"]
+            return {
+                "total_records": len(self.records),
+                "total_cost": round(summary["total_cost"], 2),
+                "total_fuel": round(total_fuel, 2),
+                "average_price": round(summary["total_cost"] / total_fuel if total_fuel > 0 else 0, 2),
+                "total_distance": round(summary["total_distance"], 2),
+                "average_consumption": round(summary["average_consumption"], 2),
+                "first_date": self.records[summary["first"]].date,
+                "last_date": self.records[summary["last"]].date
+            }
+
         total_cost = sum(record.cost for record in self.records)
         total_fuel = sum(record.fuel_amount for record in self.records)
         avg_price = total_cost / total_fuel if total_fuel > 0 else 0
@@ -129,17 +256,35 @@ class FuelTrackerApp:
         }
 
     def get_records(self) -> List[Dict]:
-        """获取所有记录"""
-        return [record.to_dict() for record in self.records]
+        """获取所有记录（记录字典在数据变化前重复使用，调用方不要修改）"""
+        return list(self._record_dicts())
 
     def delete_record(self, index: int):
         """删除指定索引的记录"""
         if 0 <= index < len(self.records):
-            del self.records[index]
-            self.save_data()
-            return True
+            return self.delete_record_by_id(self.records[index].id)
         return False
 
+    def delete_record_by_id(self, record_id: int):
+        """按 ID 删除记录"""
+        record = self.records_by_id.pop(record_id, None)
+        if record is None:
+            return False
+        # 记录按日期有序：二分找到同一天的第一条，再在同一天的记录中找到它
+        index = bisect_left(self.records, record.date, key=lambda x: x.date)
+        while self.records[index] is not record:
+            index += 1
+        del self.records[index]
+        if self._dict_view is not None:
+            del self._dict_view[index]
+        self.save_data()
+        return True
+
+    def get_record(self, record_id: int) -> Optional[Dict]:
+        """按 ID 获取记录"""
+        record = self.records_by_id.get(record_id)
+        return record.to_dict() if record else None
+
 
 def main():
     app = FuelTrackerApp()
@@ -244,5 +389,51 @@ def main():
             print("无效选项，请重新选择！")
 
 
+def import_records(args) -> int:
+    """import 子命令：批量导入历史加油记录"""
+    fmt = args.format or fuel_io.detect_format(filename=args.file)
+    if fmt is None:
+        print("无法识别文件格式，请使用 --format 指定 csv、json 或 ndjson")
+        return 1
+
+    try:
+        if args.file == "-":
+            rows, errors = fuel_io.parse_records(sys.stdin, fmt)
+        else:
+            with open(args.file, 'r', encoding='utf-8-sig', newline='') as f:
+                rows, errors = fuel_io.parse_records(f, fmt)
+    except OSError as e:
+        print(f"读取文件失败: {e}")
+        return 1
+
+    if errors:
+        print("数据校验失败，未导入任何记录：")
+        for error in errors:
+            print(f"  {error}")
+        return 1
+
+    app = FuelTrackerApp(args.data_file)
+    added = app.add_records(rows)
+    print(f"已导入 {len(added)} 条记录")
+    return 0
+
+
+def cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="燃油追踪应用")
+    subparsers = parser.add_subparsers(dest="command")
+
+    import_parser = subparsers.add_parser("import", help="批量导入 CSV / JSON / NDJSON 格式的加油记录")
+    import_parser.add_argument("file", help="数据文件路径，- 表示从标准输入读取")
+    import_parser.add_argument("--format", choices=fuel_io.FORMATS, help="文件格式（默认按扩展名推断）")
+    import_parser.add_argument("--data-file", default="fuel_records.json", help="数据文件 (默认: fuel_records.json)")
+
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        return import_records(args)
+    # 不带子命令时进入交互菜单
+    main()
+    return 0
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(cli())
\ No newline at end of file
@@ -6,6 +6,7 @@
 """
 
 from flask import Flask, render_template_string, request, jsonify
+import bisect
 import json
 import os
 from datetime import datetime
@@ -48,8 +49,7 @@ class FuelTrackerWeb:
             "note": note,
             "cost": round(cost, 2)
         }
-        self.records.append(record)
-        self.records.sort(key=lambda x: x["date"])  # 按日期排序
+        bisect.insort(self.records, record, key=lambda x: x["date"])  # 按日期有序插入
         self.save_data()
         return record
 
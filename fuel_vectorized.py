@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+向量化油耗计算 - 安装了 NumPy 时用数组运算（排序、np.diff、掩码、归约）代替逐条循环，
+未安装时 HAVE_NUMPY 为 False，调用方继续使用纯 Python 实现
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖
+    np = None
+
+HAVE_NUMPY = np is not None
+
+# 记录数少于该值时数组转换的开销大于收益，仍走纯 Python 路径
+MIN_RECORDS = 100
+
+
+def odometer_order(odometers: Sequence[float], dates: Sequence[str], ids: Sequence[int]):
+    """按 (里程, 日期, ID) 排序后的下标，与 sorted(key=(里程, 日期, ID)) 的顺序一致"""
+    return np.lexsort((np.asarray(ids), np.asarray(dates), np.asarray(odometers, dtype=float)))
+
+
+def segment_arrays(odometers, fuel_amounts) -> Tuple:
+    """按里程排好序的两列 -> (有效区间结束位置, 行驶距离, 加油量)
+
+    第 i 段为第 i-1 条到第 i 条记录之间的区间，距离和加油量都大于 0 才有效
+    """
+    distance = np.diff(odometers)
+    fuel_used = fuel_amounts[1:]
+    valid = (distance > 0) & (fuel_used > 0)
+    return np.flatnonzero(valid) + 1, distance[valid], fuel_used[valid]
+
+
+def scaled_total(values, scale: int) -> int:
+    """按 scale 换算为整数后求和，与逐条 round(value * scale) 再相加的结果相同"""
+    return int(np.rint(np.asarray(values, dtype=float) * scale).astype(np.int64).sum())
+
+
+def round_like_python(values, digits: int = 2):
+    """按位数四舍五入，结果与逐个调用 round(value, digits) 相同
+
+    np.round 先乘 10**digits 再取整，乘法的舍入误差可能让恰好落在 .5 附近的值进位方向不同，
+    这些值交给 Python 的 round 按十进制精确处理
+    """
+    factor = 10 ** digits
+    scaled = values * factor
+    result = np.rint(scaled) / factor
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= np.abs(scaled) * 1e-12 + 1e-9
+    for i in np.flatnonzero(near_half).tolist():
+        result[i] = round(float(values[i]), digits)
+    return result
+
+
+def build_segments(records: List[Dict]) -> Tuple[List[Dict], List[int], List[Dict], int]:
+    """一次算出全部记录的排序和油耗区间
+
+    返回 (按里程排序的记录, 有效区间的结束位置, 对应的区间条目, 以 0.01 为单位的油耗合计)，
+    条目的数值与 fuel_statistics.build_segment 逐对计算的结果相同
+    """
+    odometers = np.array([record["odometer"] for record in records], dtype=float)
+    fuel_amounts = np.array([record["fuel_amount"] for record in records], dtype=float)
+    order = odometer_order(odometers, [record["date"] for record in records], [record["id"] for record in records])
+    by_odometer = [records[i] for i in order.tolist()]
+
+    odometers = odometers[order]
+    positions, distance, fuel_used = segment_arrays(odometers, fuel_amounts[order])
+    efficiency = distance / fuel_used  # km/L
+    consumption = (fuel_used / distance) * 100  # L/100km
+
+    consumption = round_like_python(consumption)
+    # 与 RunningStatistics 的累计方式相同：已保留两位小数的油耗以 0.01 为单位求和
+    consumption_centi_sum = int(np.rint(consumption * 100).astype(np.int64).sum())
+
+    # 浮点运算和四舍五入都与逐条计算相同，增量更新时可以直接和这些条目比较
+    positions = positions.tolist()
+    segments = [
+        {
+            "date": by_odometer[pos]["date"],
+            "distance": d,
+            "fuel_used": f,
+            "efficiency_km_per_l": e,
+            "consumption_l_per_100km": c,
+            "from_odometer": by_odometer[pos - 1]["odometer"],
+            "to_odometer": by_odometer[pos]["odometer"]
+        }
+        for pos, d, f, e, c in zip(positions, round_like_python(distance).tolist(),
+                                   round_like_python(fuel_used).tolist(),
+                                   round_like_python(efficiency).tolist(), consumption.tolist())
+    ]
+    return by_odometer, positions, segments, consumption_centi_sum
+
+
+def sequential_sum(values) -> float:
+    """按顺序逐个累加的合计，与内置 sum 的结果完全相同（np.sum 分块求和，末位可能不同）"""
+    values = np.asarray(values, dtype=float)
+    return float(np.cumsum(values)[-1]) if len(values) else 0
+
+
+def summarize(odometers, fuel_amounts, costs) -> Dict:
+    """不生成逐段条目，直接用归约算出统计信息需要的合计值
+
+    记录按里程稳定排序（里程相同时保持传入顺序）；first / last 为里程最小、最大的记录下标
+    """
+    odometers = np.asarray(odometers, dtype=float)
+    fuel_amounts = np.asarray(fuel_amounts, dtype=float)
+    order = np.argsort(odometers, kind="stable")
+    sorted_odometers = odometers[order]
+    _, distance, fuel_used = segment_arrays(sorted_odometers, fuel_amounts[order])
+    consumption = round_like_python((fuel_used / distance) * 100)
+    return {
+        "total_cost": sequential_sum(costs),
+        "total_fuel": sequential_sum(fuel_amounts),
+        "total_distance": float(sorted_odometers[-1] - sorted_odometers[0]) if len(order) > 1 else 0,
+        "average_consumption": sequential_sum(consumption) / len(consumption) if len(consumption) else 0,
+        "first": int(order[0]),
+        "last": int(order[-1])
+    }
@@ -5,10 +5,11 @@
 """
 
 from flask import Flask, render_template_string, request, jsonify
+import bisect
 import json
 import os
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
 
 class FuelTrackerSimple:
@@ -47,8 +48,7 @@ class FuelTrackerSimple:
             "note": note,
             "cost": round(cost, 2)
         }
-        self.records.append(record)
-        self.records.sort(key=lambda x: x["date"])  # 按日期排序
+        bisect.insort(self.records, record, key=lambda x: x["date"])  # 按日期有序插入
         self.save_data()
         return record
 
@@ -112,6 +112,23 @@ class FuelTrackerSimple:
         """获取所有记录"""
         return self.records
 
+    def get_records_page(self, offset: int = 0, limit: Optional[int] = None, date_from: Optional[str] = None,
+                         date_to: Optional[str] = None, station: Optional[str] = None) -> Tuple[List[Dict], Optional[int]]:
+        """按日期顺序分页查询，返回 (本页记录, 下一页偏移量)；记录按日期有序，日期范围用二分定位
+
+        偏移量相对于过滤后的结果；没有加油站索引，按加油站过滤时在日期范围内逐条筛选
+        """
+        start = bisect.bisect_left(self.records, date_from, key=lambda x: x["date"]) if date_from else 0
+        end = bisect.bisect_right(self.records, date_to, key=lambda x: x["date"]) if date_to else len(self.records)
+        source = self.records
+        if station is not None:
+            source = [record for record in self.records[start:end] if record["station"] == station]
+            start, end = 0, len(source)
+        start = min(start + offset, end)
+        stop = end if limit is None else min(end, start + limit)
+        page = source[start:stop]
+        return page, (offset + len(page) if stop < end else None)
+
 
 app = Flask(__name__)
 tracker = FuelTrackerSimple()
@@ -519,9 +536,36 @@ def index():
     return html_template
 
 
+# /api/records 单页最多返回的记录数，以及 fields 参数可选的字段
+MAX_PAGE_SIZE = 1000
+RECORD_FIELDS = ("date", "odometer", "fuel_amount", "fuel_price", "station", "note", "cost")
+
+
 @app.route('/api/records')
 def api_records():
-    return jsonify(tracker.get_records())
+    """记录列表，支持按日期顺序分页 (offset, limit)、日期范围 (from, to)、加油站过滤 (station) 和字段投影 (fields)
+
+    不带参数时返回全部记录；还有下一页时通过 X-Next-Offset 响应头返回偏移量
+    """
+    if not request.args:
+        return jsonify(tracker.get_records())
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', type=int)
+    if offset < 0 or (limit is not None and not 1 <= limit <= MAX_PAGE_SIZE):
+        return jsonify({"success": False, "message": f"offset 不能为负数，limit 必须在 1 到 {MAX_PAGE_SIZE} 之间"}), 400
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    unknown = set(fields) - set(RECORD_FIELDS)
+    if unknown:
+        return jsonify({"success": False, "message": f"未知字段: {', '.join(sorted(unknown))}"}), 400
+
+    page, next_offset = tracker.get_records_page(offset, limit, request.args.get('from'), request.args.get('to'),
+                                                 request.args.get('station'))
+    if fields:
+        page = [{field: record[field] for field in fields} for record in page]
+    response = jsonify(page)
+    if next_offset is not None:
+        response.headers['X-Next-Offset'] = str(next_offset)
+    return response
 
 
 @app.route('/api/efficiency')
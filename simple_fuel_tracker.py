@@ -3,20 +3,142 @@
 简化的燃油追踪器 - 修复版本
 """
 
+import atexit
 import json
 import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime
-from typing import List, Dict
+from functools import wraps
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
+
+from fuel_columns import ColumnarRecordStore
+from fuel_locks import FileLock, ReadWriteLock, read_locked, write_locked
+from fuel_persistence import CommitSlot, GroupCommit, atomic_write, fsync_directory
+from fuel_statistics import MICRO, DateRangeSums, PeriodRollups, RunningStatistics, to_micro
+
+# 列式存储中已删除的行超过该数量且多于有效行时，整体重建存储释放空间
+STORE_COMPACT_MIN_DEAD = 1000
+
+
+def date_key(record: Dict) -> Tuple[str, int]:
+    """记录按日期排序的键，同一天按 ID（即添加顺序）排列"""
+    return (record["date"], record["id"])
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    """文件的 (inode, 修改时间, 大小)，文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def synced_read(method):
+    """读操作：先同步其他进程的写入，再在读锁内执行"""
+    locked = read_locked(method)
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.refresh()
+        return locked(self, *args, **kwargs)
+    return wrapper
+
+
+def synced_write(method):
+    """写操作：进程内持有写锁、跨进程持有文件锁，先同步其他进程的写入再修改"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._file_lock.acquire():
+            self._sync_from_disk()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._remember_disk_state()
+    return write_locked(wrapper)
 
 
 class FuelTrackerSimple:
-    def __init__(self, data_file: str = "fuel_records_simple.json"):
+    def __init__(self, data_file: str = "fuel_records_simple.json", journal: bool = False,
+                 fsync: bool = True, commit_window: float = 0.0, write_behind: Optional[float] = None,
+                 columnar: bool = False, compact_after: int = 1000):
         self.data_file = data_file
+        # 日志模式: 增删操作只向日志追加一行，快照由 compact() 统一重写
+        self.journal = journal
+        # 日志条目数达到 max(compact_after, 记录数的一半) 时自动合并进快照，
+        # 重写快照的开销分摊到每次写入上仍是常数，启动时回放的日志也不会无限增长
+        self.compact_after = compact_after
+        self._journal_entries = 0
+        # 每次写入后是否 fsync，关闭后写入更快，但断电时可能丢失最近的写入
+        self.fsync = fsync
+        self.journal_file = os.path.splitext(data_file)[0] + ".journal.jsonl"
+        # 最大的已分配 ID 所在的记录被删除后，快照中无法推算出下一个 ID，记在这个文件里，删除的 ID 不会再被分配
+        self.ids_file = os.path.splitext(data_file)[0] + ".ids.json"
         self.records: List[Dict] = []
+        # 记录 ID -> 记录，ID 一经分配不再改变，不受排序影响
+        self._by_id: Dict[int, Dict] = {}
+        self._next_id = 1
+        # 加油站 -> 该站记录（与 records 同样按日期排序）
+        self._by_station: Dict[str, List[Dict]] = {}
+        # 加油站 -> [花费, 加油量]（百万分之一），与 _by_station 同步维护
+        self._station_totals: Dict[str, List[int]] = {}
+        self._stats = RunningStatistics()
+        self._ranges = DateRangeSums()
+        self._rollups = PeriodRollups()
+        # 列式存储模式: 记录保存在 fuel_columns 的数组中，records 里只是只读视图，内存占用小得多
+        self._store: Optional[ColumnarRecordStore] = ColumnarRecordStore() if columnar else None
+        # 数据版本号，每次增删递增；_last_modified 为最近一次变更的时间戳
+        self._data_version = 0
+        self._last_modified = 0.0
+        # 多线程共享同一个实例时，读操作并发进行，增删和加载独占
+        self._lock = ReadWriteLock()
+        # 多个进程（如多个 gunicorn worker）共享数据文件时，写入前持有文件锁
+        self._file_lock = FileLock(os.path.splitext(data_file)[0] + ".lock")
+        # 上次读写时数据文件和日志的状态，用于发现其他进程的写入；日志已回放到的字节位置
+        self._snapshot_stamp: Optional[Tuple[int, int, int]] = None
+        self._journal_stamp: Optional[Tuple[int, int, int]] = None
+        self._journal_offset = 0
+        # 并发的增删操作合并为一次磁盘写入；commit_window 为等待更多操作加入的时间（秒）
+        self._group_commit = GroupCommit(self._commit_batch, commit_window)
+        # 延迟写入模式: 增删只修改内存，由后台线程在 write_behind 秒内写入磁盘；仅适用于单进程
+        self.write_behind = write_behind
+        self._unflushed: List[Dict] = []
+        self._dirty_since: Optional[float] = None
+        self._last_flush: Optional[float] = None
+        self._flush_mutex = threading.Lock()
+        self._dirty = threading.Event()
+        self._stopping = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
         self.load_data()
+        if self._journal_too_long():
+            self._auto_compact()
+        if write_behind is not None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="fuel-flush", daemon=True)
+            self._flusher.start()
+            # 进程正常退出时写入剩余的修改
+            atexit.register(self.close)
+
+    @property
+    def data_version(self) -> int:
+        """数据版本号（先同步其他进程的写入）"""
+        self.refresh()
+        return self._data_version
 
+    @property
+    def last_modified(self) -> float:
+        """最近一次变更的时间戳"""
+        self.refresh()
+        return self._last_modified
+
+    @write_locked
     def load_data(self):
-        """从文件加载数据"""
+        """从文件加载数据（快照 + 日志回放）"""
+        with self._file_lock.acquire(exclusive=False):
+            self._load()
+
+    def _load(self):
         if os.path.exists(self.data_file):
             try:
                 with open(self.data_file, 'r', encoding='utf-8') as f:
@@ -30,37 +152,376 @@ class FuelTrackerSimple:
                 self.records = []
         else:
             self.records = []
+        self._rebuild_id_index()
+        if self._store is not None:
+            self._rebuild_store()
+        self._rebuild_indexes()
+        # 无论是否开启日志模式都回放日志，避免切换模式后丢失未合并的写入
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._replay_journal()
+        self._remember_disk_state()
+        # 刚加载时以文件修改时间为准，多个进程读取同一份数据得到相同的时间戳
+        mtimes = [os.path.getmtime(path) for path in (self.data_file, self.journal_file) if os.path.exists(path)]
+        self._last_modified = max(mtimes) if mtimes else time.time()
+
+    def _remember_disk_state(self):
+        """记下数据文件和日志的当前状态，自己的写入不会被误认为其他进程的写入"""
+        self._snapshot_stamp = file_stamp(self.data_file)
+        self._journal_stamp = file_stamp(self.journal_file)
+
+    def _changed_on_disk(self) -> bool:
+        return file_stamp(self.data_file) != self._snapshot_stamp or file_stamp(self.journal_file) != self._journal_stamp
+
+    def refresh(self) -> bool:
+        """同步其他进程的写入；文件没有变化时只需两次 stat，返回是否有变化"""
+        if not self._changed_on_disk():
+            return False
+        with self._lock.write_lock(), self._file_lock.acquire(exclusive=False):
+            return self._sync_from_disk()
+
+    def _sync_from_disk(self) -> bool:
+        """调用方已持有写锁和文件锁：快照未变而日志只是变长时增量回放，否则整体重新加载"""
+        if not self._changed_on_disk():
+            return False
+        journal = file_stamp(self.journal_file)
+        appended_only = (
+            file_stamp(self.data_file) == self._snapshot_stamp
+            and journal is not None
+            and (self._journal_stamp is None or self._journal_stamp[0] == journal[0])
+            and journal[2] >= self._journal_offset
+        )
+        if appended_only:
+            self._replay_journal()
+            self._remember_disk_state()
+        else:
+            self._load()
+        return True
+
+    def _replay_journal(self):
+        """从上次回放到的位置继续，按顺序回放日志中的增删操作"""
+        if not os.path.exists(self.journal_file):
+            return
+        try:
+            with open(self.journal_file, 'rb') as f:
+                f.seek(self._journal_offset)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        # 没有换行符的最后一行可能还没写完，留到下次再读
+                        break
+                    offset = self._journal_offset
+                    self._journal_offset += len(raw)
+                    line = raw.strip()
+                    if not line:
+                        continue
+                    self._journal_entries += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 崩溃时可能留下半行，跳过即可
+                        print(f"跳过损坏的日志行 (偏移 {offset})")
+                        continue
+                    if entry.get("op") == "add":
+                        # 快照已替换但日志还没删除时崩溃，日志中的记录可能已在快照中
+                        if entry["record"].get("id") not in self._by_id:
+                            self._apply_add(entry["record"])
+                    elif entry.get("op") == "delete":
+                        if "id" in entry:
+                            record = self._by_id.get(entry["id"])
+                        else:
+                            # 旧版日志按索引记录删除
+                            index = entry["index"]
+                            record = self.records[index] if 0 <= index < len(self.records) else None
+                        if record is not None:
+                            self._apply_delete(record)
+        except Exception as e:
+            print(f"回放日志失败: {e}")
 
     def save_data(self):
-        """保存数据到文件"""
+        """保存数据到文件（写完整快照并清空日志）"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.records, f, ensure_ascii=False, indent=2)
+            if self._next_id - 1 not in self._by_id and self._next_id > 1:
+                # 先于快照写入：中途崩溃时下一个 ID 只会偏大，不会重复
+                atomic_write(self.ids_file, json.dumps({"next_id": self._next_id}).encode('utf-8'), fsync=self.fsync)
+            # 写临时文件后重命名覆盖，写到一半崩溃也不会截断原有数据
+            data = json.dumps(self.records, ensure_ascii=False, indent=2, default=dict)
+            atomic_write(self.data_file, data.encode('utf-8'), fsync=self.fsync)
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            self._journal_offset = 0
+            self._journal_entries = 0
             return True
         except Exception as e:
             print(f"保存数据失败: {e}")
             return False
 
+    @synced_write
+    def compact(self):
+        """将日志合并进快照文件"""
+        success = self.save_data()
+        if success:
+            # 快照已包含延迟写入模式下尚未写入的修改
+            self._mark_flushed()
+            if self._store is not None and len(self._store) > len(self.records):
+                # 顺便清理列式存储中已删除的行
+                self._rebuild_store()
+                self._rebuild_indexes()
+        return success
+
+    def _journal_too_long(self) -> bool:
+        return self.journal and self._journal_entries >= max(self.compact_after, len(self.records) // 2)
+
+    @synced_write
+    def _auto_compact(self):
+        """日志过长时合并进快照；持有文件锁后重新判断，其他进程刚合并过就不再重复"""
+        if self._journal_too_long() and self.save_data():
+            self._mark_flushed()
+
+    def _compact_store(self):
+        """列式存储中已删除的行多于有效行时整体重建（调用方持有写锁）"""
+        if self._store is None:
+            return
+        dead = len(self._store) - len(self.records)
+        if dead >= STORE_COMPACT_MIN_DEAD and dead > len(self.records):
+            # 已交给调用方的视图仍指向旧存储，继续有效
+            self._rebuild_store()
+            self._rebuild_indexes()
+
+    def _submit(self, operation):
+        """执行写操作：默认经组提交写入磁盘后返回；延迟写入模式下只修改内存，由后台线程写入"""
+        if self.write_behind is None:
+            return self._group_commit.submit(operation)
+        with self._lock.write_lock():
+            result, entries = operation()
+            if entries:
+                self._unflushed.extend(entries)
+                if self._dirty_since is None:
+                    self._dirty_since = time.time()
+                self._dirty.set()
+            self._compact_store()
+        return result
+
+    def _flush_loop(self):
+        """后台写入线程：出现修改后最多等待 write_behind 秒，把期间的修改一次写入"""
+        while not self._stopping.is_set():
+            self._dirty.wait()
+            if self._stopping.wait(self.write_behind):
+                break
+            if self.flush() and self._journal_too_long():
+                self._auto_compact()
+
+    def flush(self) -> bool:
+        """把延迟写入模式下尚未写入的修改写入磁盘；只持有读锁，写入期间查询照常进行"""
+        with self._flush_mutex, self._lock.read_lock(), self._file_lock.acquire():
+            if not self._unflushed:
+                return True
+            entries = self._unflushed
+            success = self._append_journal(*entries) if self.journal else self.save_data()
+            if success:
+                self._mark_flushed()
+                self._remember_disk_state()
+            return success
+
+    def _mark_flushed(self):
+        self._unflushed = []
+        self._dirty_since = None
+        self._dirty.clear()
+        self._last_flush = time.time()
+
+    def close(self):
+        """停止后台写入线程并写入剩余的修改"""
+        if self._flusher is not None:
+            self._stopping.set()
+            self._dirty.set()
+            self._flusher.join()
+            self._flusher = None
+            # 已关闭的实例不再需要退出时写入，也让它可以被回收（多车辆分片卸载时）
+            atexit.unregister(self.close)
+        return self.flush()
+
+    def get_metrics(self) -> Dict:
+        """持久化状态：尚未写入的操作数、最早一条未写入修改的等待时间（秒）和上次写入时间"""
+        dirty_since = self._dirty_since
+        return {
+            "write_behind": self.write_behind is not None,
+            "pending_writes": len(self._unflushed),
+            "flush_lag_seconds": round(time.time() - dirty_since, 3) if dirty_since is not None else 0,
+            "last_flush": self._last_flush,
+            "data_version": self._data_version
+        }
+
+    def _append_journal(self, *entries: Dict):
+        """向日志追加紧凑 JSON 行（每个操作一行），耗时与数据量无关"""
+        lines = "".join(json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=dict) + "\n" for entry in entries)
+        try:
+            with open(self.journal_file, 'ab') as f:
+                created = f.tell() == 0
+                if f.tell() > self._journal_offset:
+                    # 崩溃留下的半行没有换行符，先补上，避免与新写入的行粘在一起
+                    lines = "\n" + lines
+                f.write(lines.encode('utf-8'))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._journal_offset = f.tell()
+            self._journal_entries += len(entries)
+            if created and self.fsync:
+                fsync_directory(self.journal_file)
+            return True
+        except Exception as e:
+            print(f"写入日志失败: {e}")
+            return False
+
+    def _commit_batch(self, batch: List[CommitSlot]):
+        """组提交：持有写锁和文件锁依次执行整批操作，最后只写一次磁盘
+
+        每个操作返回 (结果, 日志条目)；写入失败时，有修改的操作结果改为 None
+        """
+        with self._lock.write_lock(), self._file_lock.acquire():
+            self._sync_from_disk()
+            entries: List[Dict] = []
+            for slot in batch:
+                slot.run()
+                if slot.error is None:
+                    entries.extend(slot.result[1])
+            success = True
+            if entries:
+                success = self._append_journal(*entries) if self.journal else self.save_data()
+                if success and self._journal_too_long():
+                    # 已持有文件锁，顺便把日志合并进快照，合并失败时日志仍然完整
+                    self.save_data()
+            self._compact_store()
+            self._remember_disk_state()
+        for slot in batch:
+            if slot.error is None:
+                result, written = slot.result
+                slot.result = result if success or not written else None
+
+    def _rebuild_id_index(self):
+        """重建 ID 索引，为旧数据中没有 ID 的记录补充 ID"""
+        self._by_id = {}
+        self._next_id = max(max((r["id"] for r in self.records if "id" in r), default=0) + 1, self._stored_next_id())
+        for record in self.records:
+            self._assign_id(record)
+
+    def _stored_next_id(self) -> int:
+        """ids_file 中记下的下一个 ID，文件不存在或损坏时为 1"""
+        try:
+            with open(self.ids_file, 'r', encoding='utf-8') as f:
+                return int(json.load(f)["next_id"])
+        except FileNotFoundError:
+            return 1
+        except Exception as e:
+            print(f"读取 ID 记录失败: {e}")
+            return 1
+
+    def _rebuild_store(self):
+        """把当前记录写入新的列式存储，records 和 ID 索引改为指向新的视图"""
+        self._store = ColumnarRecordStore()
+        self.records = [self._store.append(record) for record in self.records]
+        self._by_id = {record["id"]: record for record in self.records}
+
+    def _to_stored(self, record: Dict) -> Dict:
+        """列式存储模式下把新记录写入存储并返回视图，否则原样返回"""
+        if self._store is None:
+            return record
+        return self._store.append(record)
+
+    def _assign_id(self, record: Dict):
+        """登记记录 ID，没有 ID 时分配新的"""
+        if "id" not in record:
+            record["id"] = self._next_id
+        self._next_id = max(self._next_id, record["id"] + 1)
+        self._by_id[record["id"]] = record
+
+    def _touch(self):
+        """数据发生变化，更新版本号和修改时间"""
+        self._data_version += 1
+        self._last_modified = time.time()
+
+    def _rebuild_indexes(self):
+        """整体排序并重建各个索引，用于加载数据和批量导入"""
+        self.records.sort(key=date_key)
+        self._by_station = {}
+        self._station_totals = {}
+        for record in self.records:
+            self._by_station.setdefault(record["station"], []).append(record)
+            totals = self._station_totals.setdefault(record["station"], [0, 0])
+            totals[0] += to_micro(record["cost"])
+            totals[1] += to_micro(record["fuel_amount"])
+        self._stats.reset(self.records)
+        self._ranges.reset()
+        self._rollups.reset(self.records)
+        self._touch()
+
+    def _apply_add(self, record: Dict) -> Dict:
+        """在内存中插入记录，返回实际保存的记录（列式存储模式下为视图）"""
+        if not isinstance(record.get("date"), str):
+            raise ValueError(f"记录日期无效: {record.get('date')!r}")
+        record.setdefault("id", self._next_id)
+        # 先确定插入位置，出错时内存状态保持不变
+        pos = bisect_right(self.records, date_key(record), key=date_key)
+        if self._store is not None:
+            record = self._store.append(record)
+        self.records.insert(pos, record)
+        self._assign_id(record)
+        insort(self._by_station.setdefault(record["station"], []), record, key=date_key)
+        totals = self._station_totals.setdefault(record["station"], [0, 0])
+        totals[0] += to_micro(record["cost"])
+        totals[1] += to_micro(record["fuel_amount"])
+        self._stats.add(record)
+        self._ranges.invalidate(pos)
+        self._rollups.add(self.records, pos)
+        self._touch()
+        return record
+
+    def _apply_delete(self, record: Dict):
+        """在内存中删除记录"""
+        del self._by_id[record["id"]]
+        pos = bisect_left(self.records, date_key(record), key=date_key)
+        del self.records[pos]
+        station_records = self._by_station[record["station"]]
+        del station_records[bisect_left(station_records, date_key(record), key=date_key)]
+        totals = self._station_totals[record["station"]]
+        totals[0] -= to_micro(record["cost"])
+        totals[1] -= to_micro(record["fuel_amount"])
+        if not station_records:
+            del self._by_station[record["station"]]
+            del self._station_totals[record["station"]]
+        self._stats.remove(record)
+        self._ranges.invalidate(pos)
+        self._rollups.remove(self.records, pos, record)
+        if self._store is not None:
+            self._store.discard(record)
+        self._touch()
+        return record
+
+    def _make_record(self, date: str, odometer: float, fuel_amount: float, fuel_price: float, station: str = "", note: str = "") -> Dict:
+        """构造一条新记录并分配 ID"""
+        if not isinstance(date, str) or not date:
+            raise ValueError("日期不能为空")
+        cost = fuel_amount * fuel_price
+        record = {
+            "id": self._next_id,
+            "date": date,
+            "odometer": float(odometer),
+            "fuel_amount": float(fuel_amount),
+            "fuel_price": float(fuel_price),
+            "station": station,
+            "note": note,
+            "cost": round(cost, 2)
+        }
+        self._next_id += 1
+        return record
+
     def add_record(self, date: str, odometer: float, fuel_amount: float, fuel_price: float, station: str = "", note: str = ""):
         """添加加油记录"""
+        def operation():
+            record = self._apply_add(self._make_record(date, odometer, fuel_amount, fuel_price, station, note))
+            return record, [{"op": "add", "record": record}]
+
         try:
-            cost = fuel_amount * fuel_price
-            record = {
-                "date": date,
-                "odometer": float(odometer),
-                "fuel_amount": float(fuel_amount),
-                "fuel_price": float(fuel_price),
-                "station": station,
-                "note": note,
-                "cost": round(cost, 2)
-            }
-            self.records.append(record)
-            self.records.sort(key=lambda x: x["date"])  # 按日期排序
-            success = self.save_data()
-            if success:
-                return record
-            else:
-                return None
+            return self._submit(operation)
         except ValueError as e:
             print(f"输入值错误: {e}")
             return None
@@ -68,103 +529,158 @@ class FuelTrackerSimple:
             print(f"添加记录失败: {e}")
             return None
 
-    def calculate_fuel_efficiency(self) -> List[Dict]:
-        """计算每次加油的油耗"""
+    def add_records(self, rows: Iterable[Dict]) -> Optional[List[Dict]]:
+        """批量添加记录：整批只排序一次、写入一次"""
+        rows = list(rows)
+
+        def operation():
+            new_records = [
+                self._to_stored(self._make_record(row["date"], row["odometer"], row["fuel_amount"], row["fuel_price"],
+                                                  row.get("station", ""), row.get("note", "")))
+                for row in rows
+            ]
+            if not new_records:
+                return [], []
+            for record in new_records:
+                self._by_id[record["id"]] = record
+            self.records.extend(new_records)
+            # 已有部分有序，Timsort 对这种情况接近线性
+            self._rebuild_indexes()
+            return new_records, [{"op": "add", "record": record} for record in new_records]
+
         try:
-            results = []
-            if len(self.records) < 2:
-                return results
-                
-            sorted_records = sorted(self.records, key=lambda x: x["odometer"])
-
-            for i in range(1, len(sorted_records)):
-                prev_record = sorted_records[i-1]
-                curr_record = sorted_records[i]
-
-                distance = curr_record["odometer"] - prev_record["odometer"]
-                fuel_used = curr_record["fuel_amount"]
-
-                if distance > 0 and fuel_used > 0:
-                    efficiency = distance / fuel_used  # km/L
-                    consumption = (fuel_used / distance) * 100  # L/100km
-
-                    results.append({
-                        "date": curr_record["date"],
-                        "distance": round(distance, 2),
-                        "fuel_used": round(fuel_used, 2),
-                        "efficiency_km_per_l": round(efficiency, 2),
-                        "consumption_l_per_100km": round(consumption, 2),
-                        "from_odometer": prev_record["odometer"],
-                        "to_odometer": curr_record["odometer"]
-                    })
-
-            return results
-        except Exception as e:
-            print(f"计算油耗时出错: {e}")
-            return []
+            return self._submit(operation)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"输入值错误: {e}")
+            return None
 
+    @synced_read
+    def calculate_fuel_efficiency(self) -> List[Dict]:
+        """计算每次加油的油耗（增量维护的缓存序列，调用方不要修改）"""
+        return self._stats.efficiency_series()
+
+    @synced_read
     def get_statistics(self) -> Dict:
-        """获取统计信息"""
-        try:
-            if not self.records:
-                return {
-                    "total_records": 0,
-                    "total_cost": 0,
-                    "total_fuel": 0,
-                    "average_price": 0,
-                    "total_distance": 0,
-                    "average_consumption": 0,
-                    "first_date": None,
-                    "last_date": None
-                }
-
-            total_cost = sum(record["cost"] for record in self.records)
-            total_fuel = sum(record["fuel_amount"] for record in self.records)
-            avg_price = total_cost / total_fuel if total_fuel > 0 else 0
-
-            # 获取里程范围
-            sorted_records = sorted(self.records, key=lambda x: x["odometer"])
-            total_distance = 0
-            if len(sorted_records) > 1:
-                total_distance = sorted_records[-1]["odometer"] - sorted_records[0]["odometer"]
-
-            # 计算平均油耗
-            efficiencies = self.calculate_fuel_efficiency()
-            avg_consumption = 0
-            if efficiencies:
-                avg_consumption = sum(item["consumption_l_per_100km"] for item in efficiencies) / len(efficiencies)
-
-            return {
-                "total_records": len(self.records),
-                "total_cost": round(total_cost, 2),
-                "total_fuel": round(total_fuel, 2),
-                "average_price": round(avg_price, 2),
-                "total_distance": round(total_distance, 2),
-                "average_consumption": round(avg_consumption, 2) if avg_consumption > 0 else 0,
-                "first_date": sorted_records[0]["date"] if sorted_records else None,
-                "last_date": sorted_records[-1]["date"] if sorted_records else None
-            }
-        except Exception as e:
-            print(f"获取统计数据时出错: {e}")
-            return {
-                "total_records": 0,
-                "total_cost": 0,
-                "total_fuel": 0,
-                "average_price": 0,
-                "total_distance": 0,
-                "average_consumption": 0,
-                "first_date": None,
-                "last_date": None
-            }
+        """获取统计信息（由增量统计引擎维护，O(1) 读取）"""
+        return self._stats.snapshot()
+
+    @synced_read
+    def get_range_statistics(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict:
+        """日期区间 [date_from, date_to] 内的合计，由前缀和相减得到，不遍历区间内的记录
+
+        行驶距离为区间内每条记录与上一次加油（按日期）的里程差之和
+        """
+        start = bisect_left(self.records, (date_from, 0), key=date_key) if date_from else 0
+        end = bisect_right(self.records, (date_to, float("inf")), key=date_key) if date_to else len(self.records)
+        end = max(start, end)
+        cost, fuel, distance = self._ranges.totals(self.records, start, end)
+        return {
+            "from": date_from,
+            "to": date_to,
+            "total_records": end - start,
+            "total_cost": round(cost / MICRO, 2),
+            "total_fuel": round(fuel / MICRO, 2),
+            "average_price": round(cost / fuel, 2) if fuel > 0 else 0,
+            "total_distance": round(distance / 100, 2)
+        }
+
+    @synced_read
+    def get_monthly_statistics(self) -> List[Dict]:
+        """按月汇总的记录数、花费、加油量、行驶距离和油耗（增删记录时增量维护）"""
+        return PeriodRollups.summarize(self._rollups.monthly)
+
+    @synced_read
+    def get_weekly_statistics(self) -> List[Dict]:
+        """按 ISO 周汇总，字段与 get_monthly_statistics 相同"""
+        return PeriodRollups.summarize(self._rollups.weekly)
+
+    @synced_read
+    def get_station(self, station: str) -> Optional[Dict]:
+        """单个加油站的到访次数、加油量、花费、平均油价和最近一次的油价，加油站不存在时返回 None"""
+        return self._station_summary(station)
+
+    @synced_read
+    def get_station_statistics(self) -> List[Dict]:
+        """各加油站（不含未填写加油站的记录）的汇总，平均油价最低的排在前面；不遍历记录"""
+        summaries = [self._station_summary(station) for station in self._by_station if station]
+        return sorted(summaries, key=lambda item: (item["average_price"], item["station"]))
+
+    def _station_summary(self, station: str) -> Optional[Dict]:
+        station_records = self._by_station.get(station)
+        if not station_records:
+            return None
+        cost, fuel = self._station_totals[station]
+        last_record = station_records[-1]
+        return {
+            "station": station,
+            "visits": len(station_records),
+            "total_fuel": round(fuel / MICRO, 2),
+            "total_cost": round(cost / MICRO, 2),
+            "average_price": round(cost / fuel, 2) if fuel > 0 else 0,
+            "last_price": last_record["fuel_price"],
+            "last_date": last_record["date"]
+        }
 
     def delete_record(self, index: int):
         """删除指定索引的记录"""
-        if 0 <= index < len(self.records):
-            deleted_record = self.records.pop(index)
-            self.save_data()
-            return deleted_record
-        return None
+        def operation():
+            if 0 <= index < len(self.records):
+                return self._delete_operation(self.records[index]["id"])
+            return None, []
+
+        return self._submit(operation)
+
+    def delete_record_by_id(self, record_id: int) -> Optional[Dict]:
+        """按 ID 删除记录"""
+        return self._submit(lambda: self._delete_operation(record_id))
+
+    def _delete_operation(self, record_id: int):
+        record = self._by_id.get(record_id)
+        if record is None:
+            return None, []
+        self._apply_delete(record)
+        return record, [{"op": "delete", "id": record_id}]
 
+    @synced_read
+    def get_record(self, record_id: int) -> Optional[Dict]:
+        """按 ID 获取记录"""
+        return self._by_id.get(record_id)
+
+    @synced_read
     def get_records(self) -> List[Dict]:
-        """获取所有记录"""
-        return self.records
\ No newline at end of file
+        """获取所有记录（返回副本，调用方遍历时不受并发写入影响）"""
+        return list(self.records)
+
+    @synced_read
+    def get_recent_records(self, limit: int = 5) -> List[Dict]:
+        """按日期倒序返回最近的若干条记录"""
+        return self.records[:-limit - 1:-1]
+
+    @synced_read
+    def get_records_page(self, after: Optional[int] = None, limit: Optional[int] = None,
+                         date_from: Optional[str] = None, date_to: Optional[str] = None,
+                         station: Optional[str] = None) -> Tuple[List[Dict], Optional[int]]:
+        """按日期顺序分页查询，返回 (本页记录, 下一页游标)；全部通过二分定位，不扫描整个列表
+
+        after 为上一页最后一条记录的 ID，记录已被删除时抛出 KeyError
+        """
+        source = self.records if station is None else self._by_station.get(station, [])
+        start, end = 0, len(source)
+        if date_from:
+            start = bisect_left(source, (date_from, 0), key=date_key)
+        if date_to:
+            end = bisect_right(source, (date_to, float("inf")), key=date_key)
+        if after is not None:
+            cursor = self._by_id.get(after)
+            if cursor is None:
+                raise KeyError(after)
+            start = max(start, bisect_right(source, date_key(cursor), key=date_key))
+        stop = end if limit is None else min(end, start + limit)
+        page = source[start:stop]
+        next_cursor = page[-1]["id"] if page and stop < end else None
+        return page, next_cursor
+
+    @synced_read
+    def iter_records(self) -> Iterator[Dict]:
+        """按日期顺序遍历记录，遍历期间的增删不影响本次结果"""
+        return iter(list(self.records))
\ No newline at end of file
@@ -0,0 +1,460 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite 版燃油追踪器 - 与 FuelTrackerSimple 接口一致
+记录按需查询，统计在 SQL 中聚合，不再把全部数据读入内存
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
+
+from fuel_statistics import PeriodRollups
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    odometer REAL NOT NULL,
+    fuel_amount REAL NOT NULL,
+    fuel_price REAL NOT NULL,
+    station TEXT NOT NULL DEFAULT '',
+    note TEXT NOT NULL DEFAULT '',
+    cost REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_date ON records(date, id);
+CREATE INDEX IF NOT EXISTS idx_records_odometer ON records(odometer, id);
+CREATE INDEX IF NOT EXISTS idx_records_station ON records(station, date, id);
+-- 数据版本号与修改时间（Unix 时间戳），由触发器维护，所有连接/进程共享
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('last_modified', (julianday('now') - 2440587.5) * 86400.0);
+-- 1 表示已经迁移过旧版 JSON 数据（或数据库已有数据），之后启动不再读取 JSON 文件
+INSERT OR IGNORE INTO meta (key, value) VALUES ('json_imported', 0);
+CREATE TRIGGER IF NOT EXISTS records_after_insert AFTER INSERT ON records BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+    UPDATE meta SET value = (julianday('now') - 2440587.5) * 86400.0 WHERE key = 'last_modified';
+END;
+CREATE TRIGGER IF NOT EXISTS records_after_delete AFTER DELETE ON records BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+    UPDATE meta SET value = (julianday('now') - 2440587.5) * 86400.0 WHERE key = 'last_modified';
+END;
+'''
+
+RECORD_COLUMNS = "date, odometer, fuel_amount, fuel_price, station, note, cost"
+
+# 按里程排序后与上一条记录相减得到每段行驶距离
+SEGMENTS_SQL = '''
+SELECT date, odometer, fuel_amount,
+       LAG(odometer) OVER (ORDER BY odometer, date, id) AS prev_odometer
+FROM records
+'''
+
+# 日期区间合计：与 JSON 版相同，花费和加油量按百万分之一、行驶距离按 0.01 km 取整后累加
+# （SQLite 的 ROUND 遇到恰好 .5 时远离零取整，只有里程带三位小数时才可能与 JSON 版差 0.01 km）；
+# 区间开始前最后一天的记录也参与窗口计算，第一条区间内记录才能得到与上一次加油之间的里程差
+RANGE_SQL = '''
+WITH ranged AS (
+    SELECT date, cost, fuel_amount,
+           odometer - LAG(odometer) OVER (ORDER BY date, id) AS driven
+    FROM records
+    WHERE date >= COALESCE((SELECT MAX(date) FROM records WHERE date < :date_from), :date_from)
+      AND (:date_to IS NULL OR date <= :date_to)
+)
+SELECT COUNT(*) AS n,
+       SUM(ROUND(cost * 1000000)) AS cost,
+       SUM(ROUND(fuel_amount * 1000000)) AS fuel,
+       SUM(CASE WHEN driven > 0 THEN ROUND(driven * 100) ELSE 0 END) AS distance
+FROM ranged
+WHERE date >= :date_from
+'''
+
+# 按天汇总，再在 Python 中归入月份和 ISO 周（SQLite 没有 ISO 周的日期函数）
+DAILY_SQL = '''
+SELECT date, COUNT(*) AS n,
+       SUM(ROUND(cost * 1000000)) AS cost,
+       SUM(ROUND(fuel_amount * 1000000)) AS fuel,
+       SUM(CASE WHEN driven > 0 THEN ROUND(driven * 100) ELSE 0 END) AS distance,
+       SUM(CASE WHEN ROUND(driven * 100) > 0 THEN ROUND(fuel_amount * 1000000) ELSE 0 END) AS segment_fuel
+FROM (
+    SELECT date, cost, fuel_amount, odometer - LAG(odometer) OVER (ORDER BY date, id) AS driven
+    FROM records
+)
+GROUP BY date
+'''
+
+# 加油站汇总：最近一次油价由 (station, date, id) 索引直接定位
+STATIONS_SQL = '''
+SELECT station, COUNT(*) AS visits,
+       SUM(ROUND(cost * 1000000)) AS cost,
+       SUM(ROUND(fuel_amount * 1000000)) AS fuel,
+       MAX(date) AS last_date,
+       (SELECT fuel_price FROM records AS latest WHERE latest.station = records.station
+        ORDER BY date DESC, id DESC LIMIT 1) AS last_price
+FROM records
+'''
+
+
+class FuelTrackerSQLite:
+    def __init__(self, db_file: str = "fuel_records.db"):
+        self.db_file = db_file
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file)
+            conn.row_factory = sqlite3.Row
+            # WAL 模式允许多个 worker 进程同时读
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def data_version(self) -> int:
+        """数据版本号，每次增删递增"""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+        return int(row[0])
+
+    @property
+    def last_modified(self) -> float:
+        """最近一次变更的时间戳"""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'last_modified'").fetchone()
+        return float(row[0])
+
+    def get_metrics(self) -> Dict:
+        """持久化状态，字段与 FuelTrackerSimple.get_metrics 一致；每次写入都已提交，没有延迟"""
+        return {
+            "write_behind": False,
+            "pending_writes": 0,
+            "flush_lag_seconds": 0,
+            "last_flush": self.last_modified,
+            "data_version": self.data_version
+        }
+
+    def _needs_json_import(self, conn: sqlite3.Connection) -> bool:
+        """还没有迁移过 JSON 数据且数据库为空；数据库已有数据时顺便记下迁移标记"""
+        if conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()[0]:
+            return False
+        if conn.execute("SELECT 1 FROM records LIMIT 1").fetchone():
+            with conn:
+                conn.execute("UPDATE meta SET value = 1 WHERE key = 'json_imported'")
+            return False
+        return True
+
+    def import_json(self, json_file: str) -> int:
+        """数据库为空时导入旧版 JSON 数据文件，返回导入条数
+
+        迁移完成后在 meta 中记下标记，之后每次启动只查一次标记，不再解析 JSON 文件
+        """
+        try:
+            conn = self._connect()
+            # 先查数据库，只有确实需要迁移时才读取（可能很大的）JSON 文件
+            if not self._needs_json_import(conn) or not os.path.exists(json_file):
+                return 0
+            with open(json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, list):
+                return 0
+            with conn:
+                # IMMEDIATE 事务避免多个 worker 同时迁移
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("SELECT 1 FROM records LIMIT 1").fetchone():
+                    return 0
+                # 保留原有记录 ID，缺失时由数据库分配
+                conn.executemany(
+                    f"INSERT INTO records (id, {RECORD_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(r.get("id"), r["date"], float(r["odometer"]), float(r["fuel_amount"]), float(r["fuel_price"]),
+                      r.get("station", ""), r.get("note", ""), float(r["cost"])) for r in data]
+                )
+                conn.execute("UPDATE meta SET value = 1 WHERE key = 'json_imported'")
+            return len(data)
+        except Exception as e:
+            print(f"导入 JSON 数据失败: {e}")
+            return 0
+
+    def add_record(self, date: str, odometer: float, fuel_amount: float, fuel_price: float, station: str = "", note: str = ""):
+        """添加加油记录"""
+        try:
+            cost = fuel_amount * fuel_price
+            record = {
+                "date": date,
+                "odometer": float(odometer),
+                "fuel_amount": float(fuel_amount),
+                "fuel_price": float(fuel_price),
+                "station": station,
+                "note": note,
+                "cost": round(cost, 2)
+            }
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    f"INSERT INTO records ({RECORD_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (record["date"], record["odometer"], record["fuel_amount"], record["fuel_price"],
+                     record["station"], record["note"], record["cost"])
+                )
+            return {"id": cursor.lastrowid, **record}
+        except ValueError as e:
+            print(f"输入值错误: {e}")
+            return None
+        except Exception as e:
+            print(f"添加记录失败: {e}")
+            return None
+
+    def add_records(self, rows: Iterable[Dict]) -> Optional[List[Dict]]:
+        """批量添加记录，整批在一个事务中写入"""
+        try:
+            new_records = []
+            for row in rows:
+                fuel_amount = float(row["fuel_amount"])
+                fuel_price = float(row["fuel_price"])
+                new_records.append({
+                    "date": row["date"],
+                    "odometer": float(row["odometer"]),
+                    "fuel_amount": fuel_amount,
+                    "fuel_price": fuel_price,
+                    "station": row.get("station", ""),
+                    "note": row.get("note", ""),
+                    "cost": round(fuel_amount * fuel_price, 2)
+                })
+            conn = self._connect()
+            with conn:
+                for record in new_records:
+                    cursor = conn.execute(
+                        f"INSERT INTO records ({RECORD_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (record["date"], record["odometer"], record["fuel_amount"], record["fuel_price"],
+                         record["station"], record["note"], record["cost"])
+                    )
+                    record["id"] = cursor.lastrowid
+            return new_records
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"输入值错误: {e}")
+            return None
+        except Exception as e:
+            print(f"批量添加记录失败: {e}")
+            return None
+
+    def calculate_fuel_efficiency(self) -> List[Dict]:
+        """计算每次加油的油耗"""
+        try:
+            rows = self._connect().execute(
+                f"SELECT * FROM ({SEGMENTS_SQL}) "
+                "WHERE prev_odometer IS NOT NULL AND odometer > prev_odometer AND fuel_amount > 0"
+            ).fetchall()
+            results = []
+            for row in rows:
+                distance = row["odometer"] - row["prev_odometer"]
+                fuel_used = row["fuel_amount"]
+                results.append({
+                    "date": row["date"],
+                    "distance": round(distance, 2),
+                    "fuel_used": round(fuel_used, 2),
+                    "efficiency_km_per_l": round(distance / fuel_used, 2),
+                    "consumption_l_per_100km": round((fuel_used / distance) * 100, 2),
+                    "from_odometer": row["prev_odometer"],
+                    "to_odometer": row["odometer"]
+                })
+            return results
+        except Exception as e:
+            print(f"计算油耗时出错: {e}")
+            return []
+
+    def get_statistics(self) -> Dict:
+        """获取统计信息"""
+        empty = {
+            "total_records": 0,
+            "total_cost": 0,
+            "total_fuel": 0,
+            "average_price": 0,
+            "total_distance": 0,
+            "average_consumption": 0,
+            "first_date": None,
+            "last_date": None
+        }
+        try:
+            conn = self._connect()
+            # 与 JSON 版一致：花费和加油量按百万分之一取整后累加
+            totals = conn.execute(
+                "SELECT COUNT(*) AS n, SUM(ROUND(cost * 1000000)) AS cost, SUM(ROUND(fuel_amount * 1000000)) AS fuel, "
+                "MIN(odometer) AS min_odo, MAX(odometer) AS max_odo FROM records"
+            ).fetchone()
+            if not totals["n"]:
+                return empty
+
+            total_cost = int(totals["cost"] or 0)
+            total_fuel = int(totals["fuel"] or 0)
+            avg_price = total_cost / total_fuel if total_fuel > 0 else 0
+            total_distance = totals["max_odo"] - totals["min_odo"] if totals["n"] > 1 else 0
+
+            # 单段油耗在 Python 中用 round() 保留两位小数，再以 0.01 为单位累加求平均，
+            # 与 RunningStatistics 的算法相同（SQLite 的 ROUND 和 AVG 可能差 0.01）
+            consumption_centi_sum = 0
+            consumption_count = 0
+            for row in conn.execute(
+                f"SELECT odometer, prev_odometer, fuel_amount FROM ({SEGMENTS_SQL}) "
+                "WHERE prev_odometer IS NOT NULL AND odometer > prev_odometer AND fuel_amount > 0"
+            ):
+                consumption = round((row["fuel_amount"] / (row["odometer"] - row["prev_odometer"])) * 100, 2)
+                consumption_centi_sum += int(round(consumption * 100))
+                consumption_count += 1
+            avg_consumption = consumption_centi_sum / consumption_count / 100 if consumption_count else 0
+
+            # 与 JSON 版一致：取里程最小/最大那条记录的日期
+            first = conn.execute("SELECT date FROM records ORDER BY odometer, date, id LIMIT 1").fetchone()
+            last = conn.execute("SELECT date FROM records ORDER BY odometer DESC, date DESC, id DESC LIMIT 1").fetchone()
+
+            return {
+                "total_records": totals["n"],
+                "total_cost": round(total_cost / 1000000, 2),
+                "total_fuel": round(total_fuel / 1000000, 2),
+                "average_price": round(avg_price, 2),
+                "total_distance": round(total_distance, 2),
+                "average_consumption": round(avg_consumption, 2) if avg_consumption > 0 else 0,
+                "first_date": first["date"],
+                "last_date": last["date"]
+            }
+        except Exception as e:
+            print(f"获取统计数据时出错: {e}")
+            return empty
+
+    def get_range_statistics(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict:
+        """日期区间 [date_from, date_to] 内的合计，字段与 FuelTrackerSimple.get_range_statistics 一致"""
+        row = self._connect().execute(RANGE_SQL, {"date_from": date_from or "", "date_to": date_to or None}).fetchone()
+        cost, fuel, distance = int(row["cost"] or 0), int(row["fuel"] or 0), int(row["distance"] or 0)
+        return {
+            "from": date_from,
+            "to": date_to,
+            "total_records": row["n"],
+            "total_cost": round(cost / 1000000, 2),
+            "total_fuel": round(fuel / 1000000, 2),
+            "average_price": round(cost / fuel, 2) if fuel > 0 else 0,
+            "total_distance": round(distance / 100, 2)
+        }
+
+    def _period_rollups(self) -> PeriodRollups:
+        """由按天汇总的结果得到按月、按 ISO 周的汇总桶"""
+        rollups = PeriodRollups()
+        for row in self._connect().execute(DAILY_SQL):
+            rollups.add_day_totals(row["date"], (row["n"], int(row["cost"] or 0), int(row["fuel"] or 0),
+                                                 int(row["distance"] or 0), int(row["segment_fuel"] or 0)))
+        return rollups
+
+    def get_monthly_statistics(self) -> List[Dict]:
+        """按月汇总，字段与 FuelTrackerSimple.get_monthly_statistics 一致"""
+        return PeriodRollups.summarize(self._period_rollups().monthly)
+
+    def get_weekly_statistics(self) -> List[Dict]:
+        """按 ISO 周汇总"""
+        return PeriodRollups.summarize(self._period_rollups().weekly)
+
+    @staticmethod
+    def _station_summary(row: sqlite3.Row) -> Dict:
+        cost, fuel = int(row["cost"] or 0), int(row["fuel"] or 0)
+        return {
+            "station": row["station"],
+            "visits": row["visits"],
+            "total_fuel": round(fuel / 1000000, 2),
+            "total_cost": round(cost / 1000000, 2),
+            "average_price": round(cost / fuel, 2) if fuel > 0 else 0,
+            "last_price": row["last_price"],
+            "last_date": row["last_date"]
+        }
+
+    def get_station(self, station: str) -> Optional[Dict]:
+        """单个加油站的汇总，字段与 FuelTrackerSimple.get_station 一致"""
+        row = self._connect().execute(STATIONS_SQL + " WHERE station = ? GROUP BY station", (station,)).fetchone()
+        return self._station_summary(row) if row else None
+
+    def get_station_statistics(self) -> List[Dict]:
+        """各加油站的汇总，平均油价最低的排在前面"""
+        rows = self._connect().execute(STATIONS_SQL + " WHERE station != '' GROUP BY station").fetchall()
+        return sorted((self._station_summary(row) for row in rows), key=lambda item: (item["average_price"], item["station"]))
+
+    def delete_record(self, index: int) -> Optional[Dict]:
+        """删除指定索引（按日期排序）的记录"""
+        if index < 0:
+            return None
+        row = self._connect().execute(
+            "SELECT id FROM records ORDER BY date, id LIMIT 1 OFFSET ?", (index,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self.delete_record_by_id(row["id"])
+
+    def delete_record_by_id(self, record_id: int) -> Optional[Dict]:
+        """按 ID 删除记录"""
+        conn = self._connect()
+        with conn:
+            record = self.get_record(record_id)
+            if record is None:
+                return None
+            conn.execute("DELETE FROM records WHERE id = ?", (record_id,))
+        return record
+
+    def get_record(self, record_id: int) -> Optional[Dict]:
+        """按 ID 获取记录"""
+        row = self._connect().execute(
+            f"SELECT id, {RECORD_COLUMNS} FROM records WHERE id = ?", (record_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_records(self) -> List[Dict]:
+        """获取所有记录"""
+        rows = self._connect().execute(f"SELECT id, {RECORD_COLUMNS} FROM records ORDER BY date, id").fetchall()
+        return [dict(row) for row in rows]
+
+    def get_recent_records(self, limit: int = 5) -> List[Dict]:
+        """按日期倒序返回最近的若干条记录"""
+        rows = self._connect().execute(
+            f"SELECT id, {RECORD_COLUMNS} FROM records ORDER BY date DESC, id DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_records_page(self, after: Optional[int] = None, limit: Optional[int] = None,
+                         date_from: Optional[str] = None, date_to: Optional[str] = None,
+                         station: Optional[str] = None) -> Tuple[List[Dict], Optional[int]]:
+        """按日期顺序分页查询，返回 (本页记录, 下一页游标)，由 (date, id) 索引定位"""
+        conn = self._connect()
+        conditions, params = [], []
+        if station is not None:
+            conditions.append("station = ?")
+            params.append(station)
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        if after is not None:
+            cursor = conn.execute("SELECT date, id FROM records WHERE id = ?", (after,)).fetchone()
+            if cursor is None:
+                raise KeyError(after)
+            conditions.append("(date, id) > (?, ?)")
+            params.extend([cursor["date"], cursor["id"]])
+        sql = f"SELECT id, {RECORD_COLUMNS} FROM records"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY date, id"
+        if limit is not None:
+            # 多取一条用来判断是否还有下一页
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        rows = [dict(row) for row in conn.execute(sql, params)]
+        if limit is not None and len(rows) > limit:
+            page = rows[:limit]
+            return page, page[-1]["id"] if page else None
+        return rows, None
+
+    def iter_records(self) -> Iterator[Dict]:
+        """按日期顺序逐行读取记录，不一次性载入内存"""
+        cursor = self._connect().execute(f"SELECT id, {RECORD_COLUMNS} FROM records ORDER BY date, id")
+        for row in cursor:
+            yield dict(row)
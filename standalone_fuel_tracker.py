@@ -5,12 +5,15 @@
 使用Python内置库创建Web服务器
 """
 
+import bisect
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from urllib.parse import parse_qs
+from urllib.parse import parse_qs, urlsplit
 from http.server import HTTPServer, BaseHTTPRequestHandler
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
 
 class FuelTrackerSimple:
@@ -49,8 +52,7 @@ class FuelTrackerSimple:
             "note": note,
             "cost": round(cost, 2)
         }
-        self.records.append(record)
-        self.records.sort(key=lambda x: x["date"])  # 按日期排序
+        bisect.insort(self.records, record, key=lambda x: x["date"])  # 按日期有序插入
         self.save_data()
         return record
 
@@ -114,50 +116,131 @@ class FuelTrackerSimple:
         """获取所有记录"""
         return self.records
 
+    def get_records_page(self, offset: int = 0, limit: Optional[int] = None, date_from: Optional[str] = None,
+                         date_to: Optional[str] = None, station: Optional[str] = None) -> Tuple[List[Dict], Optional[int]]:
+        """按日期顺序分页查询，返回 (本页记录, 下一页偏移量)；记录按日期有序，日期范围用二分定位
+
+        偏移量相对于过滤后的结果；没有加油站索引，按加油站过滤时在日期范围内逐条筛选
+        """
+        start = bisect.bisect_left(self.records, date_from, key=lambda x: x["date"]) if date_from else 0
+        end = bisect.bisect_right(self.records, date_to, key=lambda x: x["date"]) if date_to else len(self.records)
+        source = self.records
+        if station is not None:
+            source = [record for record in self.records[start:end] if record["station"] == station]
+            start, end = 0, len(source)
+        start = min(start + offset, end)
+        stop = end if limit is None else min(end, start + limit)
+        page = source[start:stop]
+        return page, (offset + len(page) if stop < end else None)
+
 
 tracker = FuelTrackerSimple()
+# 多个工作线程共享同一个 tracker，读写都要持有这把锁
+tracker_lock = threading.Lock()
+
+# 工作线程数，可通过环境变量 FUEL_TRACKER_WORKERS 调整
+DEFAULT_WORKERS = int(os.environ.get('FUEL_TRACKER_WORKERS', 8))
+
+# /api/records 单页最多返回的记录数，以及 fields 参数可选的字段
+MAX_PAGE_SIZE = 1000
+RECORD_FIELDS = ("date", "odometer", "fuel_amount", "fuel_price", "station", "note", "cost")
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """用固定数量的工作线程处理请求，一个慢客户端不会阻塞其他人"""
+
+    def __init__(self, server_address, handler_class, workers=DEFAULT_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fuel-http')
+
+    def process_request(self, request, client_address):
+        # 超出工作线程数的连接在队列中等待
+        self.executor.submit(self.process_request_worker, request, client_address)
+
+    def process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
 
 
 class FuelTrackerHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 保持连接，浏览器加载页面和接口时可以复用同一个连接
+    protocol_version = 'HTTP/1.1'
+    # 空闲连接的超时时间（秒），避免空闲的长连接一直占用工作线程
+    timeout = 5
+
+    def send_body(self, status, content_type, body, headers=None):
+        """发送完整响应；保持连接时必须带 Content-Length，客户端才知道响应在哪里结束"""
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
     def do_GET(self):
-        if self.path == '/' or self.path == '/index.html':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
-            self.end_headers()
-            
-            html = self.generate_index_page()
-            self.wfile.write(html.encode('utf-8'))
-        elif self.path == '/api/records':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json; charset=utf-8')
-            self.end_headers()
-            
+        # 在锁内生成响应内容，发送时不持有锁，慢客户端不会阻塞其他请求
+        url = urlsplit(self.path)
+        with tracker_lock:
+            if url.path == '/' or url.path == '/index.html':
+                html = self.generate_index_page()
+                response = (200, 'text/html; charset=utf-8', html.encode('utf-8'))
+            elif url.path == '/api/records':
+                response = self.records_response(url.query)
+            elif url.path == '/api/efficiency':
+                efficiency = tracker.calculate_fuel_efficiency()
+                response = (200, 'application/json; charset=utf-8', json.dumps(efficiency, ensure_ascii=False).encode('utf-8'))
+            elif url.path == '/api/stats':
+                stats = tracker.get_statistics()
+                response = (200, 'application/json; charset=utf-8', json.dumps(stats, ensure_ascii=False).encode('utf-8'))
+            else:
+                response = (404, 'text/plain; charset=utf-8', b'404 Not Found')
+        self.send_body(*response)
+
+    def records_response(self, query):
+        """/api/records：不带参数时返回全部记录；否则按日期顺序分页 (offset, limit)，
+        支持日期范围 (from, to)、加油站过滤 (station) 和字段投影 (fields)，还有下一页时通过 X-Next-Offset 响应头返回偏移量
+        """
+        params = {key: values[0] for key, values in parse_qs(query, keep_blank_values=True).items()}
+        if not params:
             records = tracker.get_records()
-            self.wfile.write(json.dumps(records, ensure_ascii=False).encode('utf-8'))
-        elif self.path == '/api/efficiency':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json; charset=utf-8')
-            self.end_headers()
-            
-            efficiency = tracker.calculate_fuel_efficiency()
-            self.wfile.write(json.dumps(efficiency, ensure_ascii=False).encode('utf-8'))
-        elif self.path == '/api/stats':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json; charset=utf-8')
-            self.end_headers()
-            
-            stats = tracker.get_statistics()
-            self.wfile.write(json.dumps(stats, ensure_ascii=False).encode('utf-8'))
-        else:
-            self.send_response(404)
-            self.end_headers()
-            self.wfile.write(b'404 Not Found')
+            return (200, 'application/json; charset=utf-8', json.dumps(records, ensure_ascii=False).encode('utf-8'))
+        try:
+            offset = int(params.get('offset', 0))
+            limit = int(params['limit']) if 'limit' in params else None
+        except ValueError:
+            offset, limit = -1, None
+        fields = [f for f in params.get('fields', '').split(',') if f]
+        unknown = set(fields) - set(RECORD_FIELDS)
+        message = None
+        if offset < 0 or (limit is not None and not 1 <= limit <= MAX_PAGE_SIZE):
+            message = f"offset 必须是非负整数，limit 必须是 1 到 {MAX_PAGE_SIZE} 之间的整数"
+        elif unknown:
+            message = f"未知字段: {', '.join(sorted(unknown))}"
+        if message is not None:
+            result = {"success": False, "message": message}
+            return (400, 'application/json; charset=utf-8', json.dumps(result, ensure_ascii=False).encode('utf-8'))
+
+        page, next_offset = tracker.get_records_page(offset, limit, params.get('from'), params.get('to'), params.get('station'))
+        if fields:
+            page = [{field: record[field] for field in fields} for record in page]
+        headers = {'X-Next-Offset': str(next_offset)} if next_offset is not None else {}
+        return (200, 'application/json; charset=utf-8', json.dumps(page, ensure_ascii=False).encode('utf-8'), headers)
 
     def do_POST(self):
+        content_length = int(self.headers.get('Content-Length', 0))
+        # 请求体总是读完，否则会被当作同一连接上的下一个请求
+        post_data = self.rfile.read(content_length).decode('utf-8')
         if self.path == '/api/add_record':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length).decode('utf-8')
-            
             # 解析表单数据
             parsed_data = parse_qs(post_data)
             
@@ -169,23 +252,15 @@ class FuelTrackerHandler(BaseHTTPRequestHandler):
                 station = parsed_data.get('station', [''])[0]
                 note = parsed_data.get('note', [''])[0]
                 
-                tracker.add_record(date, odometer, fuel_amount, fuel_price, station, note)
+                with tracker_lock:
+                    tracker.add_record(date, odometer, fuel_amount, fuel_price, station, note)
                 
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json; charset=utf-8')
-                self.end_headers()
-                response = json.dumps({"success": True}, ensure_ascii=False)
-                self.wfile.write(response.encode('utf-8'))
+                status, result = 200, {"success": True}
             except Exception as e:
-                self.send_response(400)
-                self.send_header('Content-type', 'application/json; charset=utf-8')
-                self.end_headers()
-                response = json.dumps({"success": False, "message": str(e)}, ensure_ascii=False)
-                self.wfile.write(response.encode('utf-8'))
+                status, result = 400, {"success": False, "message": str(e)}
+            self.send_body(status, 'application/json; charset=utf-8', json.dumps(result, ensure_ascii=False).encode('utf-8'))
         else:
-            self.send_response(404)
-            self.end_headers()
-            self.wfile.write(b'404 Not Found')
+            self.send_body(404, 'text/plain; charset=utf-8', b'404 Not Found')
 
     def generate_index_page(self):
         stats = tracker.get_statistics()
@@ -587,18 +662,19 @@ class FuelTrackerHandler(BaseHTTPRequestHandler):
         return html
 
 
-def run_server(host='0.0.0.0', port=5000):
+def run_server(host='0.0.0.0', port=5000, workers=DEFAULT_WORKERS):
     server_address = (host, port)
-    httpd = HTTPServer(server_address, FuelTrackerHandler)
+    httpd = ThreadPoolHTTPServer(server_address, FuelTrackerHandler, workers)
     print(f"燃油追踪应用启动中...")
     print(f"请在浏览器中访问 http://localhost:{port}")
     print(f"或者在局域网内的其他设备上访问 http://<您的IP地址>:{port}")
+    print(f"工作线程数: {workers}")
     print("按 Ctrl+C 停止应用")
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\n应用已停止")
-        httpd.shutdown()
+        httpd.server_close()
 
 
 if __name__ == '__main__':
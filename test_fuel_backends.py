@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+存储后端一致性测试 - 同样的增删操作下，JSON 版和 SQLite 版返回相同的统计结果
+
+用法: python -m unittest test_fuel_backends（或 python -m pytest test_fuel_backends.py）
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from simple_fuel_tracker import FuelTrackerSimple
+from sqlite_fuel_tracker import FuelTrackerSQLite
+
+SEEDS = 100
+MAX_RECORDS = 60
+
+
+class BackendParityTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def make_trackers(self, seed: int):
+        """两个后端执行同一串随机的增删操作（里程偶尔回退，加油量有时带三位小数）"""
+        rng = random.Random(seed)
+        json_tracker = FuelTrackerSimple(os.path.join(self.tmp, f"{seed}.json"), fsync=False)
+        sqlite_tracker = FuelTrackerSQLite(os.path.join(self.tmp, f"{seed}.db"))
+        odometer = 0
+        for _ in range(rng.randint(1, MAX_RECORDS)):
+            odometer += rng.uniform(-50, 700)
+            args = (f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                    round(odometer, rng.choice([0, 1, 2])),
+                    round(rng.uniform(0, 60), rng.choice([1, 2, 3])),
+                    round(rng.uniform(5, 9), 2),
+                    rng.choice("ABC"))
+            added = json_tracker.add_record(*args)
+            self.assertEqual(sqlite_tracker.add_record(*args)["id"], added["id"])
+            if rng.random() < 0.2:
+                json_tracker.delete_record_by_id(added["id"])
+                sqlite_tracker.delete_record_by_id(added["id"])
+        return json_tracker, sqlite_tracker
+
+    def test_statistics_match(self):
+        for seed in range(SEEDS):
+            with self.subTest(seed=seed):
+                json_tracker, sqlite_tracker = self.make_trackers(seed)
+                self.assertEqual(sqlite_tracker.get_statistics(), json_tracker.get_statistics())
+                self.assertEqual(sqlite_tracker.calculate_fuel_efficiency(), json_tracker.calculate_fuel_efficiency())
+                self.assertEqual(sqlite_tracker.get_range_statistics("2024-03-01", "2024-08-31"),
+                                 json_tracker.get_range_statistics("2024-03-01", "2024-08-31"))
+                self.assertEqual(sqlite_tracker.get_monthly_statistics(), json_tracker.get_monthly_statistics())
+                self.assertEqual(sqlite_tracker.get_station_statistics(), json_tracker.get_station_statistics())
+
+    def test_average_consumption_rounding(self):
+        # 两段油耗 69.19 和 27.1，平均值恰好落在 48.145；SQLite 的 AVG(ROUND(...)) 会得到 48.14
+        json_tracker = FuelTrackerSimple(os.path.join(self.tmp, "rounding.json"), fsync=False)
+        sqlite_tracker = FuelTrackerSQLite(os.path.join(self.tmp, "rounding.db"))
+        for args in (("2024-01-01", 1000, 40, 7), ("2024-01-02", 1100, 69.19, 7), ("2024-01-03", 1200, 27.1, 7)):
+            json_tracker.add_record(*args)
+            sqlite_tracker.add_record(*args)
+        self.assertEqual(json_tracker.get_statistics()["average_consumption"], 48.15)
+        self.assertEqual(sqlite_tracker.get_statistics(), json_tracker.get_statistics())
+
+    def test_empty_statistics_match(self):
+        json_tracker = FuelTrackerSimple(os.path.join(self.tmp, "empty.json"), fsync=False)
+        sqlite_tracker = FuelTrackerSQLite(os.path.join(self.tmp, "empty.db"))
+        self.assertEqual(sqlite_tracker.get_statistics(), json_tracker.get_statistics())
+
+
+if __name__ == "__main__":
+    unittest.main()
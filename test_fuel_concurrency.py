@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+并发写入测试 - 多进程共享数据文件（文件锁 + 日志增量回放）、组提交、读写锁和日志尾部半行的处理
+
+用法: python -m unittest test_fuel_concurrency（或 python -m pytest test_fuel_concurrency.py）
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from fuel_locks import ReadWriteLock
+from fuel_persistence import GroupCommit
+from simple_fuel_tracker import FuelTrackerSimple
+
+PROCESSES = 4
+THREADS_PER_PROCESS = 2
+RECORDS_PER_THREAD = 15
+
+
+def add_records_worker(data_file: str, journal: bool, worker: int, queue):
+    """子进程：几个线程同时向共享数据文件添加记录（每三条删掉一条），返回 (分配到的 ID, 删除的 ID)"""
+    tracker = FuelTrackerSimple(data_file, journal=journal, fsync=False)
+    ids = []
+    deleted = []
+    ids_lock = threading.Lock()
+
+    def run(thread: int):
+        for i in range(RECORDS_PER_THREAD):
+            record = tracker.add_record(f"2024-01-{i % 28 + 1:02d}", worker * 10000 + thread * 1000 + i, 30, 7.5,
+                                        f"P{worker}", f"{worker}-{thread}-{i}")
+            with ids_lock:
+                ids.append(record["id"] if record is not None else None)
+            if record is not None and i % 3 == 0 and tracker.delete_record_by_id(record["id"]) is not None:
+                with ids_lock:
+                    deleted.append(record["id"])
+
+    threads = [threading.Thread(target=run, args=(t,)) for t in range(THREADS_PER_PROCESS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put((ids, deleted))
+
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.tmp, "records.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class MultiProcessWriteTest(TempDirTestCase):
+    """多个进程、每个进程多个线程同时写同一份数据文件"""
+
+    def check_concurrent_adds(self, journal: bool):
+        # 父进程先打开，之后只通过 refresh 同步其他进程的写入
+        observer = FuelTrackerSimple(self.data_file, journal=journal, fsync=False)
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        processes = [context.Process(target=add_records_worker, args=(self.data_file, journal, w, queue))
+                     for w in range(PROCESSES)]
+        for process in processes:
+            process.start()
+        returned = [queue.get(timeout=120) for _ in processes]
+        for process in processes:
+            process.join(timeout=30)
+            self.assertEqual(process.exitcode, 0)
+
+        total = PROCESSES * THREADS_PER_PROCESS * RECORDS_PER_THREAD
+        assigned = [record_id for ids, _ in returned for record_id in ids]
+        deleted = {record_id for _, ids in returned for record_id in ids}
+        self.assertNotIn(None, assigned)
+        self.assertEqual(len(set(assigned)), total, "不同进程分配到了相同的 ID")
+        self.assertEqual(len(deleted), PROCESSES * THREADS_PER_PROCESS * len(range(0, RECORDS_PER_THREAD, 3)))
+
+        reloaded = FuelTrackerSimple(self.data_file, journal=journal, fsync=False)
+        stored = reloaded.get_records()
+        self.assertEqual(sorted(record["id"] for record in stored), sorted(set(assigned) - deleted))
+        # 增量同步的结果与重新加载一致
+        self.assertEqual([dict(r) for r in observer.get_records()], [dict(r) for r in stored])
+        self.assertEqual(observer.get_statistics(), reloaded.get_statistics())
+
+    def test_concurrent_adds_snapshot(self):
+        self.check_concurrent_adds(journal=False)
+
+    def test_concurrent_adds_journal(self):
+        self.check_concurrent_adds(journal=True)
+
+
+class GroupCommitTest(unittest.TestCase):
+    """每个提交者拿到的是自己操作的结果或异常"""
+
+    def test_results_and_errors_reach_each_submitter(self):
+        batches = []
+
+        def commit_batch(batch):
+            batches.append(len(batch))
+            # 模拟磁盘写入，让其他线程有时间排队进入下一批
+            time.sleep(0.01)
+            for slot in batch:
+                slot.run()
+
+        commit = GroupCommit(commit_batch)
+        outcomes = {}
+
+        def submit(n: int):
+            def operation():
+                if n % 5 == 0:
+                    raise ValueError(n)
+                return n * 2
+            try:
+                outcomes[n] = ("ok", commit.submit(operation))
+            except ValueError as e:
+                outcomes[n] = ("error", e.args[0])
+
+        threads = [threading.Thread(target=submit, args=(n,)) for n in range(40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for n in range(40):
+            self.assertEqual(outcomes[n], ("error", n) if n % 5 == 0 else ("ok", n * 2))
+        self.assertEqual(sum(batches), 40)
+        self.assertLess(len(batches), 40, "并发的写操作没有合并提交")
+
+    def test_commit_failure_reaches_whole_batch(self):
+        def commit_batch(batch):
+            raise OSError("disk full")
+
+        commit = GroupCommit(commit_batch)
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                commit.submit(lambda: 1)
+
+    def test_tracker_reports_failed_write_as_none(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            tracker = FuelTrackerSimple(os.path.join(tmp, "records.json"), fsync=False)
+            tracker.save_data = lambda: False
+            self.assertIsNone(tracker.add_record("2024-01-01", 100, 30, 7.5))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+class JournalTornTailTest(TempDirTestCase):
+    """崩溃留下的没有换行符的日志尾部"""
+
+    def test_torn_tail_is_skipped_then_terminated(self):
+        writer = FuelTrackerSimple(self.data_file, journal=True, fsync=False)
+        writer.add_record("2024-01-01", 100, 30, 7.5)
+        writer.add_record("2024-01-02", 500, 30, 7.5)
+        # 模拟写到一半时崩溃
+        with open(writer.journal_file, "ab") as f:
+            f.write(b'{"op":"add","record":{"id":99,"da')
+
+        reader = FuelTrackerSimple(self.data_file, journal=True, fsync=False)
+        self.assertEqual(len(reader.get_records()), 2)
+
+        # 下一次追加先补上换行符，半行成为一行损坏的日志，新记录单独一行
+        added = reader.add_record("2024-01-03", 900, 30, 7.5)
+        self.assertIsNotNone(added)
+        with open(reader.journal_file, "rb") as f:
+            lines = f.read().split(b"\n")
+        self.assertEqual(lines[-1], b"")
+        self.assertEqual(lines[-3], b'{"op":"add","record":{"id":99,"da')
+        self.assertEqual(json.loads(lines[-2])["record"]["id"], added["id"])
+
+        # 重新加载和增量回放都跳过损坏的行，得到同样的三条记录
+        reloaded = FuelTrackerSimple(self.data_file, journal=True, fsync=False)
+        self.assertEqual([r["id"] for r in reloaded.get_records()], [1, 2, added["id"]])
+        self.assertEqual([r["id"] for r in writer.get_records()], [1, 2, added["id"]])
+
+
+class ReadWriteLockTest(unittest.TestCase):
+    def test_readers_share_and_writer_is_exclusive(self):
+        lock = ReadWriteLock()
+        inside = []
+        peak = []
+        gate = threading.Barrier(3)
+
+        def reader():
+            with lock.read_lock():
+                inside.append(1)
+                gate.wait(timeout=5)  # 三个读者必须同时持有读锁才能通过
+                peak.append(len(inside))
+                inside.pop()
+
+        readers = [threading.Thread(target=reader) for _ in range(3)]
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join()
+        self.assertEqual(max(peak), 3)
+
+        order = []
+
+        def blocked_reader():
+            with lock.read_lock():
+                order.append("reader")
+
+        with lock.write_lock():
+            blocked = threading.Thread(target=blocked_reader)
+            blocked.start()
+            time.sleep(0.05)
+            order.append("writer")
+            # 写锁持有者可以再次获取读锁和写锁
+            with lock.read_lock(), lock.write_lock():
+                pass
+        blocked.join(timeout=5)
+        self.assertEqual(order, ["writer", "reader"])
+
+
+if __name__ == "__main__":
+    unittest.main()